@@ -1,3 +1,5 @@
+from django.core.files.storage import default_storage
+from django.db.models import Prefetch
 from rest_framework import serializers
 
 from ..models import Book, Category, Author
@@ -19,13 +21,72 @@ class CategorySerializer(serializers.ModelSerializer):
         ]
 
 
-class BookSerializer(serializers.ModelSerializer):
+def get_ordered_prefetch(field_name):
+    """
+    Return prefetch of many2many field of Book in order in which relations have been created - order of the source,
+    which the read model keeps as well
+    """
+    field = Book._meta.get_field(field_name)
+    through_table = field.remote_field.through._meta.db_table
+    return Prefetch(field_name, queryset=field.related_model.objects.extra(order_by=[f'{through_table}.id']))
+
+
+class SparseFieldsMixin(object):
+    """
+    Serialize only fields passed in `fields` argument.
+    `columns` and `prefetches` map serialized fields to model columns and relations they need,
+    fields missing in `columns` need the column of the same name.
+    """
+    columns = {}
+    prefetches = {}
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_columns(cls, fields):
+        return [column for field in fields for column in cls.columns.get(field, [field])]
+
+    @classmethod
+    def get_prefetches(cls, fields):
+        return [cls.prefetches[field] for field in fields if field in cls.prefetches]
+
+
+class ThumbnailMixin(serializers.Serializer):
+    """
+    Serialize thumbnail as url of local copy once cached, else as remote url
+    """
+    thumbnail = serializers.SerializerMethodField()
+
+    @staticmethod
+    def get_thumbnail(instance):
+        if instance.thumbnail_path:
+            return default_storage.url(instance.thumbnail_path)
+        return instance.thumbnail
+
+
+class BookSerializer(SparseFieldsMixin, ThumbnailMixin, serializers.ModelSerializer):
     categories = CategorySerializer(many=True, read_only=True)
     authors = AuthorSerializer(many=True, read_only=True)
 
+    columns = {
+        'authors': [],
+        'categories': [],
+        'thumbnail': ['thumbnail', 'thumbnail_path'],
+    }
+    prefetches = {
+        'authors': get_ordered_prefetch('authors'),
+        'categories': get_ordered_prefetch('categories'),
+    }
+
     def to_representation(self, instance):
         representation = super(BookSerializer, self).to_representation(instance)
-        representation['published_date'] = instance.published_date.strftime('%Y')
+        if 'published_date' in representation:
+            representation['published_date'] = instance.published_date.strftime('%Y')
         return representation
 
     class Meta:
@@ -40,3 +101,31 @@ class BookSerializer(serializers.ModelSerializer):
             'ratings_count',
             'thumbnail'
         ]
+
+
+class BookReadSerializer(SparseFieldsMixin, ThumbnailMixin, serializers.ModelSerializer):
+    """
+    Serialize book from denormalized read model columns, with the same output as BookSerializer
+    """
+    authors = serializers.SerializerMethodField()
+    published_date = serializers.CharField(source='published_year')
+    categories = serializers.SerializerMethodField()
+
+    columns = {
+        'authors': ['authors_names'],
+        'published_date': ['published_year'],
+        'categories': ['categories_names'],
+        'thumbnail': ['thumbnail', 'thumbnail_path'],
+    }
+
+    @staticmethod
+    def get_authors(instance):
+        return [{'name': name} for name in instance.authors_names]
+
+    @staticmethod
+    def get_categories(instance):
+        return [{'name': name} for name in instance.categories_names]
+
+    class Meta:
+        model = Book
+        fields = BookSerializer.Meta.fields
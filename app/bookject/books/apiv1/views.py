@@ -1,3 +1,5 @@
+from django.conf import settings
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.filters import OrderingFilter
 from rest_framework.generics import ListAPIView, RetrieveAPIView, CreateAPIView
@@ -5,40 +7,71 @@ from rest_framework.renderers import TemplateHTMLRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..mixins import BookCreateUpdateMixin, BookRetrieveMixin, BookListMixin
-from .serializers import BookSerializer
-from ..models import Book
+from ...core.mixins import ReplicaReadMixin, PrecompressedResponseMixin
+from ..mixins import BookCreateUpdateMixin, BookRetrieveMixin, BookListMixin, BookTopMixin, BookFieldsMixin
+from .serializers import BookSerializer, BookReadSerializer
+from ..filters import BookFilterSet, BookTopFilterSet
+from ..models import Book, CatalogVersion
 
 
-class BookAPIView(APIView):
+class BookAPIView(BookFieldsMixin, ReplicaReadMixin, PrecompressedResponseMixin, APIView):
     model = Book
     serializer_class = BookSerializer
     renderer_classes = [TemplateHTMLRenderer]
 
+    def get_cache_version(self):
+        """
+        Cached responses are valid until books are written again
+        """
+        version, full_version = CatalogVersion.get_versions()
+        return version
+
+    def get_serializer_class(self):
+        """
+        Serve from denormalized read model unless disabled
+        """
+        if settings.BOOKS_SERVE_READ_MODEL:
+            return BookReadSerializer
+        return self.serializer_class
+
 
 class BookListAPIView(BookListMixin, BookAPIView, ListAPIView):
     """
     List all books
-    Available filters: published_date, author (aka author__name)
-    Available ordering: published_date
+    Available filters: see BookFilterSet - author, category, published_date, min_year, max_year,
+    min_rating, min_ratings_count, title (prefix)
+    Available ordering: published_date, average_rating, ratings_count, score
+    Sparse fieldsets: fields, exclude
     """
     template_name = 'books/list.html'
+    precompress = True
 
-    filter_backends = [OrderingFilter]
-    ordering_fields = ['published_date']
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = BookFilterSet
+    ordering_fields = ['published_date', 'average_rating', 'ratings_count', 'score']
 
     def get(self, request, *args, **kwargs):
-        books = self.get_queryset()
-        serialized_books = self.get_serializer(books, many=True)
         context = {
-            'books': serialized_books.data
+            'books': self.list_books()
         }
         return Response(context, status=status.HTTP_200_OK)
 
 
+class BookTopAPIView(BookTopMixin, BookListAPIView):
+    """
+    List top rated books, by Bayesian-weighted score
+    Available filters: see BookTopFilterSet - year, author, category (author and category repeatable)
+    Number of books: n (max 100)
+    Sparse fieldsets: fields, exclude
+    """
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = BookTopFilterSet
+
+
 class BookRetrieveAPIView(BookRetrieveMixin, BookAPIView, RetrieveAPIView):
     """
     Retrieve a book by book_id get parameter.
+    Sparse fieldsets: fields, exclude
     """
     template_name = 'books/single.html'
 
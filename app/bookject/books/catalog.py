@@ -0,0 +1,326 @@
+import logging
+import math
+import sys
+import threading
+import time
+from array import array
+from datetime import date, timedelta
+
+from django.conf import settings
+
+from .models import Book, CatalogVersion
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# Columns loaded into the index besides columns of serialized fields - columns used for ordering
+INDEX_COLUMNS = ['id', 'changed_date', 'published_date', 'average_rating', 'ratings_count', 'score']
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_trigrams(name):
+    return {name[i:i + 3] for i in range(len(name) - 2)}
+
+
+def is_null(value):
+    """
+    Return True if value of index column stands for null - nan or -1
+    """
+    return value != value or value == -1
+
+
+def get_positions(bitmap):
+    """
+    Return positions of set bits of bitmap, in ascending order
+    """
+    bits = bin(bitmap)[:1:-1]
+    positions = []
+    position = bits.find('1')
+    while position != -1:
+        positions.append(position)
+        position = bits.find('1', position + 1)
+    return positions
+
+
+class CatalogSnapshot(object):
+    """
+    Not modified once in use - CatalogIndex patches a copy, so requests may read it without locks.
+    Books are rows of array-backed columns, filters are bitmaps (int) of rows.
+    """
+    # Structures shared by a copy until it changes them
+    structures = ('ids', 'rows', 'columns', 'years', 'authors', 'trigrams', 'payloads')
+
+    def __init__(self, serializer_class, version=0):
+        self.serializer_class = serializer_class
+        self.fields = serializer_class.Meta.fields
+        self.version = version
+        self.built_at = time.monotonic()
+        # Books changed since this moment are patched on the next version change
+        self.changed_since = None
+
+        self.ids = array('q')
+        self.rows = {}  # row by Book.id
+        self.columns = {
+            'published_date': array('l'),  # ordinal
+            'average_rating': array('d'),  # nan if null
+            'ratings_count': array('q'),  # -1 if null
+            'score': array('d'),
+            'changed_date': array('d'),  # timestamp, unchanged books are not serialized again by patches
+        }
+        self.years = {}  # bitmap by published year
+        self.authors = {}  # bitmap by upper-cased author name
+        self.trigrams = {}  # set of upper-cased author names by their trigram
+        self.payloads = []  # serialized values of self.fields by row
+
+        # Names of structures shared with the snapshot this one was copied from, trigrams of sets owned by this one
+        self.shared, self.owned_trigrams = set(), set()
+
+    def copy(self, version):
+        """
+        Return snapshot sharing all structures with this one, each is copied when the patch first changes it
+        """
+        snapshot = CatalogSnapshot(self.serializer_class, version)
+        snapshot.changed_since = self.changed_since
+        for name in self.structures:
+            setattr(snapshot, name, getattr(self, name))
+        snapshot.shared = set(self.structures)
+        return snapshot
+
+    def get_writable(self, name):
+        """
+        Return structure to change, copied first if it is shared
+        """
+        if name in self.shared:
+            self.shared.remove(name)
+            value = getattr(self, name)
+            if name == 'columns':
+                value = {column_name: array(column.typecode, column) for column_name, column in value.items()}
+            elif isinstance(value, array):
+                value = array(value.typecode, value)
+            else:
+                value = value.copy()
+            setattr(self, name, value)
+        return getattr(self, name)
+
+    def add_trigram(self, trigram, name):
+        trigrams = self.get_writable('trigrams')
+        if trigram in self.owned_trigrams:
+            trigrams[trigram].add(name)
+        else:
+            trigrams[trigram] = trigrams.get(trigram, set()) | {name}
+            self.owned_trigrams.add(trigram)
+
+    def get_author_keys(self, payload):
+        return {author['name'].upper() for author in payload[self.fields.index('authors')]}
+
+    def unset_row(self, row):
+        """
+        Remove row of book from year and author bitmaps
+        """
+        mask = ~(1 << row)
+        self.get_writable('years')[date.fromordinal(self.columns['published_date'][row]).year] &= mask
+        authors = self.get_writable('authors')
+        for name in self.get_author_keys(self.payloads[row]):
+            authors[name] &= mask
+
+    def set_book(self, book, payload):
+        """
+        Add book to the snapshot or replace its previous version
+        """
+        row = self.rows.get(book.id)
+        columns, payloads = self.get_writable('columns'), self.get_writable('payloads')
+        if row is None:
+            row = self.get_writable('rows')[book.id] = len(self.ids)
+            self.get_writable('ids').append(book.id)
+            for column in columns.values():
+                column.append(0)
+            payloads.append(payload)
+        else:
+            self.unset_row(row)
+            payloads[row] = payload
+
+        columns['published_date'][row] = book.published_date.toordinal()
+        columns['average_rating'][row] = math.nan if book.average_rating is None else book.average_rating
+        columns['ratings_count'][row] = -1 if book.ratings_count is None else book.ratings_count
+        columns['score'][row] = book.score
+        columns['changed_date'][row] = book.changed_date.timestamp()
+
+        bit = 1 << row
+        year = book.published_date.year
+        years, authors = self.get_writable('years'), self.get_writable('authors')
+        years[year] = years.get(year, 0) | bit
+        for name in self.get_author_keys(payload):
+            if name not in authors:
+                for trigram in get_trigrams(name):
+                    self.add_trigram(trigram, name)
+            authors[name] = authors.get(name, 0) | bit
+
+    def load(self, queryset):
+        """
+        Add or replace books of queryset
+        """
+        columns = INDEX_COLUMNS + self.serializer_class.get_columns(self.fields)
+        for book in queryset.only(*columns).iterator():
+            row = self.rows.get(book.id)
+            if row is not None and self.columns['changed_date'][row] == book.changed_date.timestamp():
+                # Already patched in, within the overlap
+                continue
+            data = self.serializer_class(book).data
+            self.set_book(book, tuple(data[field] for field in self.fields))
+            if self.changed_since is None or book.changed_date > self.changed_since:
+                self.changed_since = book.changed_date
+
+    def get_matching_authors(self, term):
+        """
+        Return names of authors which contain term, case-insensitive like icontains lookup
+        """
+        term = term.upper()
+        if len(term) < 3:
+            candidates = self.authors
+        else:
+            trigrams = [self.trigrams.get(trigram, set()) for trigram in get_trigrams(term)]
+            candidates = set.intersection(*trigrams)
+        return [name for name in candidates if term in name]
+
+    def filter(self, authors=None, years=None):
+        """
+        Return bitmap of books written by any author whose name contains one of `authors`
+        and published in one of `years`
+        """
+        bitmap = (1 << len(self.ids)) - 1
+        if authors:
+            authors_bitmap = 0
+            for term in authors:
+                for name in self.get_matching_authors(term):
+                    authors_bitmap |= self.authors[name]
+            bitmap &= authors_bitmap
+        if years:
+            years_bitmap = 0
+            for year in years:
+                years_bitmap |= self.years.get(year, 0)
+            bitmap &= years_bitmap
+        return bitmap
+
+    def order(self, rows, ordering):
+        """
+        Sort rows by ordering fields (with "-" prefix for descending), nulls like in PostgreSQL,
+        then by id
+        """
+        rows.sort(key=lambda row: self.ids[row])
+        for field in reversed(ordering or []):
+            descending = field.startswith('-')
+            column = self.columns[field.lstrip('-')]
+            # Nulls are last in ascending order and first in descending
+            rows.sort(key=lambda row: (is_null(column[row]), column[row]), reverse=descending)
+        return rows
+
+    def search(self, authors=None, years=None, ordering=None, fields=None):
+        """
+        Return serialized books matching filters in given order, only with given fields
+        """
+        rows = self.order(get_positions(self.filter(authors, years)), ordering)
+        fields = fields or self.fields
+        indexes = [self.fields.index(field) for field in fields]
+        return [dict(zip(fields, (self.payloads[row][index] for index in indexes))) for row in rows]
+
+    def get_memory_usage(self):
+        """
+        Return approximate memory used by parts of the snapshot in bytes
+        """
+        return {
+            'columns': sum(sys.getsizeof(column) for column in [self.ids, *self.columns.values()]),
+            'rows': sys.getsizeof(self.rows),
+            'years': sys.getsizeof(self.years) + sum(map(sys.getsizeof, self.years.values())),
+            'authors': sys.getsizeof(self.authors) + sum(map(sys.getsizeof, self.authors.values())),
+            'trigrams': sys.getsizeof(self.trigrams) + sum(map(sys.getsizeof, self.trigrams.values())),
+            'payloads': sys.getsizeof(self.payloads) + sum(
+                sys.getsizeof(payload) + sum(map(sys.getsizeof, payload)) for payload in self.payloads
+            ),
+        }
+
+
+class CatalogIndex(object):
+    """
+    In-process index of books which answers /books filters and ordering without the database.
+    Catalog version is checked at most every CHECK_INTERVAL seconds, on change books changed since
+    the last check are patched in, index is rebuilt every REBUILD_INTERVAL seconds.
+    """
+
+    def __init__(self, serializer_class, options=None):
+        options = options or settings.BOOKS_CATALOG_INDEX
+        # Serializer of read model, which needs no relations
+        self.serializer_class = serializer_class
+        self.check_interval = options['CHECK_INTERVAL']
+        self.rebuild_interval = options['REBUILD_INTERVAL']
+        # Books committed late with older changed_date are still patched in
+        self.patch_overlap = timedelta(seconds=options['PATCH_OVERLAP'])
+        self.snapshot = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def build(self, version):
+        start = time.perf_counter()
+        snapshot = CatalogSnapshot(self.serializer_class, version)
+        snapshot.load(Book.objects.order_by('id'))
+        logger.info(
+            f"Catalog index of {len(snapshot.ids)} books built in {time.perf_counter() - start:.2f}s, "
+            f"{sum(snapshot.get_memory_usage().values())} bytes"
+        )
+        return snapshot
+
+    def patch(self, version):
+        snapshot = self.snapshot.copy(version)
+        if snapshot.changed_since is not None:
+            snapshot.load(Book.objects.filter(changed_date__gte=snapshot.changed_since - self.patch_overlap))
+        else:
+            snapshot.load(Book.objects.all())
+        return snapshot
+
+    def get_snapshot(self):
+        """
+        Return up to date snapshot, rebuilt or patched if catalog version changed
+        """
+        now = time.monotonic()
+        if self.snapshot is not None and now - self.checked_at < self.check_interval:
+            return self.snapshot
+
+        with self.lock:
+            # Other thread checked the version in the meantime
+            if self.snapshot is not None and now - self.checked_at < self.check_interval:
+                return self.snapshot
+
+            version, full_version = CatalogVersion.get_versions()
+            snapshot = self.snapshot
+            if (
+                snapshot is None
+                or full_version > snapshot.version
+                or now - snapshot.built_at > self.rebuild_interval
+            ):
+                snapshot = self.build(version)
+            elif version != snapshot.version:
+                built_at = snapshot.built_at
+                snapshot = self.patch(version)
+                snapshot.built_at = built_at
+            # Threads not holding the lock read checked_at once they see a snapshot, so it is set first
+            self.checked_at = time.monotonic()
+            self.snapshot = snapshot
+        return snapshot
+
+    def search(self, authors=None, years=None, ordering=None, fields=None):
+        return self.get_snapshot().search(authors, years, ordering, fields)
+
+
+def get_catalog_index():
+    """
+    Return catalog index of the process
+    """
+    # Serializers module imports views through apiv1 package, which import this module
+    from .apiv1.serializers import BookReadSerializer
+
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = CatalogIndex(BookReadSerializer)
+        return _index
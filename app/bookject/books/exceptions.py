@@ -50,3 +50,10 @@ class IncorrectPublishedDateOfBook(APIException):
     status_code = status.HTTP_400_BAD_REQUEST
     default_detail = 'Incorrect published date for book'
 
+
+class InvalidFieldsParameter(APIException):
+    """
+    Raised when unknown field is passed in fields/exclude parameter
+    """
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Unknown field in fields/exclude parameter.'
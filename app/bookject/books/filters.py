@@ -0,0 +1,106 @@
+from datetime import datetime
+from functools import reduce
+from operator import or_
+
+import django_filters
+from django import forms
+from django.db.models import Q, Exists, OuterRef
+
+from .exceptions import BooksNotFound
+from .models import Book
+
+
+def get_published_years(values):
+    """
+    Return list of valid years from published_date values, raise BooksNotFound if none of them is valid
+    """
+    if not values:
+        return []
+    years = []
+    try:
+        for value in values:
+            year = int(value)
+            if datetime.now().year >= year > 0:
+                years.append(year)
+    except (TypeError, ValueError):
+        raise BooksNotFound
+    if not years:
+        raise BooksNotFound
+    return years
+
+
+class MultipleCharField(forms.Field):
+    """
+    List of values of repeated GET parameter, eg. ?author=Tolkien&author=Lewis
+    """
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        return list(value or [])
+
+
+class MultipleCharFilter(django_filters.Filter):
+    field_class = MultipleCharField
+
+
+class BookFilterSet(django_filters.FilterSet):
+    """
+    Filters of /books. Related authors and categories are matched with EXISTS subqueries,
+    so a book is listed once and filters compile to a single statement.
+    Repeated author, category and published_date parameters match any of the values.
+    """
+    author = MultipleCharFilter(method='filter_author', help_text="Author name contains")
+    category = MultipleCharFilter(method='filter_category', help_text="Category name, case-insensitive")
+    published_date = MultipleCharFilter(method='filter_published_date', help_text="Published in year")
+    min_year = django_filters.NumberFilter(field_name='published_date', lookup_expr='year__gte')
+    max_year = django_filters.NumberFilter(field_name='published_date', lookup_expr='year__lte')
+    min_rating = django_filters.NumberFilter(field_name='average_rating', lookup_expr='gte')
+    min_ratings_count = django_filters.NumberFilter(field_name='ratings_count', lookup_expr='gte')
+    # Case-sensitive, so it may use book_title_prefix_idx
+    title = django_filters.CharFilter(field_name='title', lookup_expr='startswith', help_text="Title starts with")
+
+    class Meta:
+        model = Book
+        fields = []
+
+    @staticmethod
+    def filter_author(queryset, name, value):
+        if not value:
+            return queryset
+        query = reduce(or_, [Q(author__name__icontains=author_name) for author_name in value])
+        return queryset.filter(Exists(Book.authors.through.objects.filter(query, book_id=OuterRef('pk'))))
+
+    @staticmethod
+    def filter_category(queryset, name, value):
+        if not value:
+            return queryset
+        query = reduce(or_, [Q(category__name__iexact=category_name) for category_name in value])
+        return queryset.filter(Exists(Book.categories.through.objects.filter(query, book_id=OuterRef('pk'))))
+
+    @staticmethod
+    def filter_published_date(queryset, name, value):
+        """
+        Year lookups are compiled to date ranges, which may use book_published_date_idx
+        """
+        years = get_published_years(value)
+        if not years:
+            return queryset
+        return queryset.filter(reduce(or_, [Q(published_date__year=year) for year in years]))
+
+
+class BookTopFilterSet(django_filters.FilterSet):
+    """
+    Filters of /books/top, author and category as in BookFilterSet.
+    Year matches published_year, so top books of a year are the first entries of book_year_score_idx.
+    """
+    year = django_filters.NumberFilter(method='filter_year', help_text="Published in year")
+    author = MultipleCharFilter(method=BookFilterSet.filter_author, help_text="Author name contains")
+    category = MultipleCharFilter(method=BookFilterSet.filter_category, help_text="Category name, case-insensitive")
+
+    class Meta:
+        model = Book
+        fields = []
+
+    @staticmethod
+    def filter_year(queryset, name, value):
+        return queryset.filter(published_year=str(int(value)))
@@ -0,0 +1,158 @@
+import logging
+from urllib.parse import quote
+
+from django.db import transaction, IntegrityError, DataError
+
+from ..core.exceptions import GetResponseError, ResponseDeserializationError, UpstreamQuotaExceeded
+from ..core.utils import deserialize_response, get_response, BULK
+from .mixins import BookDownloader
+from .models import ImportCheckpoint, QuarantinedBook
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# Google Books returns at most 40 results per request
+MAX_PAGE_SIZE = 40
+
+
+class BookImporter(object):
+    """
+    Import all pages of search results in chunks. Each chunk is written with its m2m relations,
+    quarantined books and checkpoint in one transaction, so interrupted import resumes after the last chunk.
+    """
+
+    def __init__(self, query, page_size=MAX_PAGE_SIZE, chunk_size=None, restart=False):
+        self.query = query
+        self.checkpoint, created = ImportCheckpoint.objects.get_or_create(
+            query=query, defaults={'page_size': min(page_size, MAX_PAGE_SIZE)},
+        )
+        # Resumed import keeps page size of its checkpoint, so page index means the same results
+        self.chunk_size = chunk_size or self.checkpoint.page_size
+        if restart and not created:
+            self.restart()
+
+    def restart(self):
+        """
+        Reset checkpoint to the first page and drop books quarantined by the previous run
+        """
+        with transaction.atomic():
+            QuarantinedBook.objects.filter(query=self.query).delete()
+            self.checkpoint.page_index, self.checkpoint.position, self.checkpoint.last_book_id = 0, 0, ''
+            self.checkpoint.imported, self.checkpoint.quarantined, self.checkpoint.finished = 0, 0, False
+            self.checkpoint.save()
+
+    def get_url(self, page_index):
+        page_size = self.checkpoint.page_size
+        return (
+            f"{BookDownloader.source_url}{quote(self.query)}"
+            f"&startIndex={page_index * page_size}&maxResults={page_size}"
+        )
+
+    def get_page(self, page_index):
+        """
+        Return items of page of search results, empty list past the last page, and total number of results
+        """
+        volumes = deserialize_response(get_response(self.get_url(page_index), priority=BULK))
+        return volumes.get('items', []), volumes.get('totalItems', 0)
+
+    def get_start_position(self, items):
+        """
+        Return position of the first not processed item of the checkpoint page.
+        Results may have shifted since the checkpoint, then the last processed item is looked up by id.
+        """
+        position, last_book_id = self.checkpoint.position, self.checkpoint.last_book_id
+        if not position:
+            return 0
+        if position <= len(items) and items[position - 1].get('id') == last_book_id:
+            return position
+        for index, item in enumerate(items):
+            if item.get('id') == last_book_id:
+                return index + 1
+        # Processed items are written again, which upserts make harmless
+        return 0
+
+    def write(self, items):
+        """
+        Write books, return (book, error) pairs of quarantined ones
+        """
+        downloader = BookDownloader(books=items, priority=BULK, quarantine=True)
+        if items:
+            downloader.perform_create()
+        return downloader.quarantined
+
+    def write_one_by_one(self, items):
+        """
+        Write books separately to find the ones rejected by the database, return all quarantined ones
+        """
+        quarantined = []
+        for item in items:
+            try:
+                with transaction.atomic():
+                    quarantined += self.write([item])
+            except (IntegrityError, DataError) as err:
+                quarantined.append((item, str(err).strip()))
+        return quarantined
+
+    def save_chunk(self, items, page_index, position, page_finished):
+        """
+        Write chunk of page items, quarantined books and checkpoint in one transaction
+        """
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    quarantined = self.write(items)
+            except (IntegrityError, DataError):
+                quarantined = self.write_one_by_one(items)
+
+            QuarantinedBook.objects.bulk_create([
+                QuarantinedBook(query=self.query, book_id=str(item.get('id', '')), data=item, error=error)
+                for item, error in quarantined
+            ])
+            for item, error in quarantined:
+                logger.warning(f"Book {item.get('id')} of import {self.query} quarantined - {error}")
+
+            checkpoint = self.checkpoint
+            if page_finished:
+                checkpoint.page_index, checkpoint.position, checkpoint.last_book_id = page_index + 1, 0, ''
+            else:
+                checkpoint.page_index, checkpoint.position = page_index, position
+                checkpoint.last_book_id = str(items[-1].get('id', ''))
+            checkpoint.imported += len(items) - len(quarantined)
+            checkpoint.quarantined += len(quarantined)
+            checkpoint.save()
+
+    def run(self, max_pages=None):
+        """
+        Import pages from the checkpoint until the last one or until `max_pages` pages are imported.
+        Upstream errors stop the import, which may be resumed later.
+        Return the checkpoint.
+        """
+        checkpoint = self.checkpoint
+        pages = 0
+        while not checkpoint.finished and (max_pages is None or pages < max_pages):
+            page_index = checkpoint.page_index
+            try:
+                items, total_items = self.get_page(page_index)
+            except (GetResponseError, ResponseDeserializationError, UpstreamQuotaExceeded) as err:
+                logger.error(f"Import {self.query} stopped at page {page_index} - {err}")
+                break
+
+            if not items:
+                checkpoint.finished = True
+                checkpoint.save()
+                break
+
+            start = self.get_start_position(items)
+            for chunk_start in range(start, len(items), self.chunk_size):
+                chunk_end = min(chunk_start + self.chunk_size, len(items))
+                self.save_chunk(items[chunk_start:chunk_end], page_index, chunk_end, chunk_end == len(items))
+            if start >= len(items):
+                # Page was processed before it shrank
+                self.save_chunk([], page_index, 0, True)
+
+            pages += 1
+            # Pages may be short before the last one, which ends at totalItems
+            if (page_index + 1) * checkpoint.page_size >= total_items:
+                checkpoint.finished = True
+                checkpoint.save()
+        return checkpoint
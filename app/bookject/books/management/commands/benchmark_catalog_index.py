@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from ...apiv1.serializers import BookReadSerializer
+from ...apiv1.views import BookListAPIView
+from ...catalog import CatalogIndex
+from ...filters import get_published_years
+from ...models import Book, CatalogVersion
+from ....core.utils.benchmark import measure, summarize, format_summary
+
+
+class Command(BaseCommand):
+    help = "Report memory usage of catalog index and compare latency of /books queries answered by it and by the ORM"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Number of simulated requests per query")
+        parser.add_argument(
+            '--query', action='append', dest='queries',
+            help="Query string of /books to benchmark, eg. author=tolkien&ordering=-score (repeatable)",
+        )
+
+    def get_default_queries(self):
+        book = Book.objects.exclude(authors_names=[]).order_by('-ratings_count', 'id').first()
+        author = book.authors_names[0].split()[-1] if book else 'a'
+        year = book.published_date.year if book else 2000
+        return [
+            '',
+            f'author={author}',
+            f'published_date={year}&ordering=-average_rating',
+            f'author={author}&published_date={year}&fields=book_id,title',
+        ]
+
+    def get_view(self, query):
+        view = BookListAPIView()
+        view.args, view.kwargs, view.format_kwarg = (), {}, None
+        view.request = view.initialize_request(RequestFactory().get(f'/books?{query}'))
+        return view
+
+    def handle(self, *args, **options):
+        if not Book.objects.exists():
+            raise CommandError("No books to benchmark, ingest some first")
+
+        index = CatalogIndex(BookReadSerializer)
+        snapshot = index.build(CatalogVersion.get_versions()[0])
+        usage = snapshot.get_memory_usage()
+        self.stdout.write(
+            f"index: books={len(snapshot.ids)} bytes={sum(usage.values())} "
+            + ' '.join(f'{part}={size}' for part, size in usage.items())
+        )
+
+        for query in options['queries'] or self.get_default_queries():
+            view = self.get_view(query)
+            fields = view.get_fields()
+
+            def orm_request():
+                return view.get_serializer(view.get_queryset(), many=True, fields=fields).data
+
+            def index_request():
+                years = get_published_years(view.request.GET.getlist('published_date'))
+                return snapshot.search(view.request.GET.getlist('author'), years, view.get_ordering(), fields)
+
+            self.stdout.write(f"?{query} books={len(index_request())}")
+            for name, request in [('orm', orm_request), ('index', index_request)]:
+                latencies, elapsed = measure(request, options['requests'])
+                self.stdout.write('  ' + format_summary(name, summarize(latencies, elapsed)))
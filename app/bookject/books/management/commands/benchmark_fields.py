@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework.renderers import JSONRenderer
+
+from ...apiv1.serializers import BookSerializer, BookReadSerializer
+from ...mixins import limit_queryset
+from ...models import Book
+from ....core.utils.benchmark import measure, summarize, format_summary
+
+
+class Command(BaseCommand):
+    help = "Compare latency and payload size of /books list with sparse fieldset and with all fields"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=100, help="Number of books in each response")
+        parser.add_argument('--requests', type=int, default=200, help="Number of simulated requests")
+        parser.add_argument('--fields', default='book_id,title', help="Sparse fieldset to compare")
+
+    def handle(self, *args, **options):
+        if not Book.objects.exists():
+            raise CommandError("No books to benchmark, ingest some first")
+
+        sparse_fields = options['fields'].split(',')
+        for serializer_class in [BookReadSerializer, BookSerializer]:
+            unknown = set(sparse_fields) - set(serializer_class.Meta.fields)
+            if unknown:
+                raise CommandError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+            for name, fields in [('sparse', sparse_fields), ('full', serializer_class.Meta.fields)]:
+                def request():
+                    queryset = limit_queryset(Book.objects.order_by('id'), serializer_class, fields)
+                    data = serializer_class(queryset[:options['books']], many=True, fields=fields).data
+                    return JSONRenderer().render(data)
+
+                payload = request()
+                with connections['default'].execute_wrapper(self.count_query):
+                    self.queries = 0
+                    request()
+                    queries = self.queries
+                latencies, elapsed = measure(request, options['requests'])
+                summary = dict(summarize(latencies, elapsed), bytes=len(payload), queries=queries)
+                self.stdout.write(format_summary(f'{serializer_class.__name__} {name}', summary))
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ...thumbnails import cache_missing_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Download thumbnails of books which still hot-link them from the source"
+
+    def handle(self, *args, **options):
+        cached = cache_missing_thumbnails()
+        self.stdout.write(f"cached={cached}")
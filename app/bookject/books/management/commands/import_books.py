@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from ...importer import BookImporter, MAX_PAGE_SIZE
+
+
+class Command(BaseCommand):
+    help = "Import all pages of search results for query, checkpointed after each chunk"
+
+    def add_arguments(self, parser):
+        parser.add_argument('query', help="Search query, like q of POST /db/")
+        parser.add_argument('--page-size', type=int, default=MAX_PAGE_SIZE, help="Results per request (max 40)")
+        parser.add_argument('--chunk-size', type=int, help="Books written in one transaction, defaults to page size")
+        parser.add_argument('--max-pages', type=int, help="Stop after this many pages, resume_imports continues")
+        parser.add_argument('--restart', action='store_true', help="Start from the first page, dropping checkpoint and quarantined books")
+
+    def handle(self, *args, **options):
+        importer = BookImporter(
+            options['query'],
+            page_size=options['page_size'],
+            chunk_size=options['chunk_size'],
+            restart=options['restart'],
+        )
+        checkpoint = importer.run(max_pages=options['max_pages'])
+        self.stdout.write(format_checkpoint(checkpoint))
+
+
+def format_checkpoint(checkpoint):
+    state = 'finished' if checkpoint.finished else f'next page={checkpoint.page_index} position={checkpoint.position}'
+    return (
+        f"{checkpoint.query}: {state} imported={checkpoint.imported} quarantined={checkpoint.quarantined}"
+    )
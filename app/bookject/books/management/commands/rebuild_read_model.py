@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...readmodel import rebuild_read_model
+
+
+class Command(BaseCommand):
+    help = "Backfill denormalized read model of books and check its consistency with normalized rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report inconsistent books")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of books processed at once")
+
+    def handle(self, *args, **options):
+        stats = rebuild_read_model(check=options['check'], batch_size=options['batch_size'])
+        self.stdout.write(
+            f"checked={stats['checked']} inconsistent={stats['inconsistent']} examples={stats['examples']}"
+        )
+        if options['check'] and stats['inconsistent']:
+            raise CommandError("Read model is inconsistent, run rebuild_read_model to fix it")
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ...refresh import BookRefresher, get_catalog_lag
+
+
+class Command(BaseCommand):
+    help = "Refresh stale books from the source, most popular of the oldest first"
+
+    def add_arguments(self, parser):
+        options = getattr(settings, 'BOOKS_REFRESH', {})
+        parser.add_argument('--batch-size', type=int, help="Number of books refreshed in one batch")
+        parser.add_argument('--budget', type=int, help="Max number of upstream requests per hour, 0 for no limit")
+        parser.add_argument('--stale-after', type=int, default=options.get('STALE_AFTER', 24 * 60 * 60),
+                            help="Age in seconds after which book is considered stale")
+        parser.add_argument('--loop', action='store_true', help="Keep refreshing until interrupted")
+        parser.add_argument('--interval', type=int, default=options.get('INTERVAL', 60),
+                            help="Seconds between batches when running in a loop")
+        parser.add_argument('--stats', action='store_true', help="Only report staleness of the catalog")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.report_lag(options['stale_after'])
+            return
+
+        refresher = BookRefresher(
+            batch_size=options['batch_size'],
+            hourly_budget=options['budget'],
+            stale_after=options['stale_after'],
+        )
+        while True:
+            stats = refresher.refresh_batch()
+            self.stdout.write(f"batch: {stats} budget_remaining={refresher.budget.get_remaining()}")
+            self.report_lag(options['stale_after'])
+            if not options['loop']:
+                break
+
+            # Give connection back between batches of long-running loop
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def report_lag(self, stale_after):
+        lag = get_catalog_lag(stale_after)
+        self.stdout.write(' '.join(f'{key}={value}' for key, value in lag.items()))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...importer import BookImporter
+from ...models import ImportCheckpoint
+from .import_books import format_checkpoint
+
+
+class Command(BaseCommand):
+    help = "Continue unfinished imports from their last checkpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help="Queries of imports to resume, all unfinished by default")
+        parser.add_argument('--max-pages', type=int, help="Stop each import after this many pages")
+        parser.add_argument('--list', action='store_true', help="Only report progress of imports")
+
+    def handle(self, *args, **options):
+        checkpoints = ImportCheckpoint.objects.order_by('created_date')
+        if options['queries']:
+            checkpoints = checkpoints.filter(query__in=options['queries'])
+            missing = set(options['queries']) - {checkpoint.query for checkpoint in checkpoints}
+            if missing:
+                raise CommandError(f"No imports of: {', '.join(sorted(missing))}")
+
+        for checkpoint in checkpoints:
+            if not options['list'] and not checkpoint.finished:
+                checkpoint = BookImporter(checkpoint.query).run(max_pages=options['max_pages'])
+            self.stdout.write(format_checkpoint(checkpoint))
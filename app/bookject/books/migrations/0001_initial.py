@@ -0,0 +1,45 @@
+# Generated by Django 3.1.3 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Book',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_id', models.CharField(max_length=12, unique=True)),
+                ('title', models.CharField(max_length=200)),
+                ('published_date', models.DateField()),
+                ('exact_date', models.BooleanField(default=False)),
+                ('average_rating', models.FloatField(null=True)),
+                ('ratings_count', models.PositiveIntegerField(null=True)),
+                ('thumbnail', models.URLField(max_length=500)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('modified_date', models.DateTimeField(auto_now=True)),
+                ('authors', models.ManyToManyField(to='books.Author')),
+                ('categories', models.ManyToManyField(to='books.Category')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.3 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='modified_date',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.3 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_book_modified_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='authors_names',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='categories_names',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='published_year',
+            field=models.CharField(default='', max_length=4),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.3 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_book_read_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='thumbnail_path',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='thumbnail',
+            field=models.URLField(db_index=True, max_length=500),
+        ),
+    ]
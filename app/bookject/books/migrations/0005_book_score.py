@@ -0,0 +1,26 @@
+# Generated by Django 3.1.3 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_thumbnail_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-score', 'id'], name='book_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['published_year', '-score', 'id'], name='book_year_score_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.1.3 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200, unique=True)),
+                ('page_size', models.PositiveSmallIntegerField()),
+                ('page_index', models.PositiveIntegerField(default=0)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('last_book_id', models.CharField(blank=True, default='', max_length=12)),
+                ('imported', models.PositiveIntegerField(default=0)),
+                ('quarantined', models.PositiveIntegerField(default=0)),
+                ('finished', models.BooleanField(default=False)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('modified_date', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuarantinedBook',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(blank=True, max_length=200)),
+                ('book_id', models.CharField(blank=True, max_length=200)),
+                ('data', models.JSONField()),
+                ('error', models.TextField()),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
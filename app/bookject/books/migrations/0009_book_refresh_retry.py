@@ -0,0 +1,23 @@
+# Generated by Django 3.1.3 on 2026-10-19 13:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_importcheckpoint_quarantinedbook'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='refresh_failures',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='refresh_retry_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
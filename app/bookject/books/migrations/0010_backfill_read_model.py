@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def get_related_names(through, related_field, books_ids):
+    """
+    Return names of related objects by book id, in order in which relations have been created
+    """
+    names = {book_id: [] for book_id in books_ids}
+    relations = through.objects.filter(book_id__in=books_ids) \
+                               .order_by('id') \
+                               .values_list('book_id', f'{related_field}__name')
+    for book_id, name in relations:
+        names[book_id].append(name)
+    return names
+
+
+def backfill_read_model(apps, schema_editor):
+    """
+    Fill read model and score of books written before they existed, as rebuild_read_model command does.
+    Books without published_year have not been written since.
+    """
+    Book = apps.get_model('books', 'Book')
+    prior_mean, prior_count = settings.BOOKS_SCORE_PRIOR_MEAN, settings.BOOKS_SCORE_PRIOR_COUNT
+    queryset = Book.objects.filter(published_year='').order_by('id')
+    last_id = 0
+    while True:
+        books = list(queryset.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not books:
+            return
+        last_id = books[-1].id
+
+        ids = [book.id for book in books]
+        authors = get_related_names(Book.authors.through, 'author', ids)
+        categories = get_related_names(Book.categories.through, 'category', ids)
+        for book in books:
+            ratings_count, average_rating = book.ratings_count or 0, book.average_rating or 0
+            book.authors_names = authors[book.id]
+            book.categories_names = categories[book.id]
+            book.published_year = book.published_date.strftime('%Y')
+            book.score = (prior_count * prior_mean + ratings_count * average_rating) / (prior_count + ratings_count)
+        Book.objects.bulk_update(books, ['authors_names', 'categories_names', 'published_year', 'score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_book_refresh_retry'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_read_model, migrations.RunPython.noop),
+    ]
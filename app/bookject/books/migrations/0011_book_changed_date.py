@@ -0,0 +1,25 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def copy_modified_date(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    Book.objects.update(changed_date=F('modified_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0010_backfill_read_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='changed_date',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_modified_date, migrations.RunPython.noop),
+    ]
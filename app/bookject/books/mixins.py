@@ -1,77 +1,138 @@
 import logging
 from datetime import datetime
 
-from django.db.models import Q
-from django.http import Http404
-from rest_framework.generics import get_object_or_404
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
 
-from ..core.utils import deserialize_response, get_response, BulkCreateManager
-from .models import Book, Author, Category
-from .exceptions import BooksNotFound, IncorrectPublishedDateOfBook, BookDoesNotExists, BookParserException, \
-    InvalidQueryParameterInBody
+from ..core.db.routers import pin_to_primary, is_pinned_to_primary
+from ..core.db.upsert import bulk_upsert, bulk_get_or_create
+from ..core.utils import deserialize_response, get_response, SingleFlight, SharedSingleFlight, \
+    INTERACTIVE
+from .catalog import get_catalog_index
+from .filters import get_published_years
+from .models import Book, Author, Category, CatalogVersion
+from .thumbnails import get_cached_thumbnails, schedule_thumbnails
+from .exceptions import BooksNotFound, IncorrectPublishedDateOfBook, BookParserException, \
+    InvalidQueryParameterInBody, InvalidFieldsParameter
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
+# Concurrent requests with the same query share one download and write, threads of the process wait for
+# the one waiting for or holding the advisory lock of the query, which coalesces requests of all processes
+ingestions = SingleFlight()
+shared_ingestions = SharedSingleFlight('ingestion')
 
-class BookAuthorNameMixin(object):
-    def filter_by_author_name(self, queryset):
+
+def get_parameter_values(request, name):
+    """
+    Return values of comma separated, possibly repeated GET parameter
+    """
+    return [value for item in request.GET.getlist(name) for value in item.split(',') if value]
+
+
+def limit_queryset(queryset, serializer_class, fields):
+    """
+    Load only model columns and relations needed to serialize given fields
+    """
+    queryset = queryset.only(*serializer_class.get_columns(fields))
+    prefetches = serializer_class.get_prefetches(fields)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+class BookFieldsMixin(object):
+    def get_fields(self):
+        """
+        Return fields to serialize, limited with "fields" and "exclude" parameters
+        eg. ?fields=book_id,title or ?exclude=authors&exclude=categories
+        """
+        all_fields = self.get_serializer_class().Meta.fields
+        fields = get_parameter_values(self.request, 'fields') or all_fields
+        exclude = get_parameter_values(self.request, 'exclude')
+        if set(fields + exclude) - set(all_fields):
+            raise InvalidFieldsParameter
+        return [field for field in all_fields if field in fields and field not in exclude]
+
+    def limit_queryset(self, queryset):
         """
-        Return filtered queryset by author's name
-        Allow multiple filtering
+        Load only model columns and relations needed by requested fields
         """
-        authors_names = self.request.GET.getlist('author')
-        if authors_names:
-            queries = [Q(authors__name__icontains=author_name) for author_name in authors_names]
-            query = queries.pop()
-            for item in queries:
-                query |= item
-            queryset = queryset.filter(query)
-        return queryset
+        return limit_queryset(queryset, self.get_serializer_class(), self.get_fields())
 
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_fields())
+        return super().get_serializer(*args, **kwargs)
 
-class BookPublishedDateMixin(object):
-    def filter_by_published_date(self, queryset):
+
+class BookListMixin(object):
+    # Parameters which catalog index can answer, other filters are run in the database
+    catalog_index_parameters = {'author', 'published_date', 'ordering', 'fields', 'exclude'}
+
+    def get_queryset(self):
         """
-        Return filtered queryset by published_date
-        Allow multiple filtering
+        Get queryset and apply filter backends of the view (filters, ordering)
         """
-        published_dates = self.request.GET.getlist('published_date')
-        if published_dates:
-            years = []
-            try:
-                for date in published_dates:
-                    year = int(date)
-                    if datetime.now().year >= year > 0:
-                        years.append(year)
-                if years:
-                    queryset = queryset.filter(published_date__year__in=years)
-                else:
-                    raise BooksNotFound
-            except (TypeError, ValueError):
-                raise BooksNotFound
-        return queryset
+        queryset = self.model.objects.all()
+        queryset = self.filter_queryset(queryset)
+
+        return self.limit_queryset(queryset)
+
+    def get_ordering(self):
+        """
+        Return ordering fields from "ordering" parameter, valid for the view
+        """
+        return OrderingFilter().get_ordering(self.request, self.model.objects.none(), self)
+
+    def list_books(self):
+        """
+        Return serialized books, from in-process catalog index if enabled.
+        Clients pinned to primary have just written books, which the index may not have yet.
+        """
+        if (
+            settings.BOOKS_CATALOG_INDEX['ENABLED']
+            and not is_pinned_to_primary(self.request)
+            and set(self.request.GET) <= self.catalog_index_parameters
+        ):
+            return get_catalog_index().search(
+                authors=self.request.GET.getlist('author'),
+                years=get_published_years(self.request.GET.getlist('published_date')),
+                ordering=self.get_ordering(),
+                fields=self.get_fields(),
+            )
+        return self.get_serializer(self.get_queryset(), many=True).data
 
 
-class BookListMixin(BookPublishedDateMixin, BookAuthorNameMixin):
-    def filter_queryset(self, queryset):
+class BookTopMixin(object):
+    max_top = 100
+    default_top = 10
+
+    def get_top_count(self):
         """
-        Run filters on queryset
+        Return number of top books to list from "n" parameter
         """
-        queryset = self.filter_by_published_date(queryset)
-        queryset = self.filter_by_author_name(queryset)
-        return queryset
+        try:
+            return min(self.max_top, max(1, int(self.request.GET.get('n', self.default_top))))
+        except ValueError:
+            raise BooksNotFound
 
     def get_queryset(self):
         """
-        Get queryset and apply custom publish date filter
+        Get top rated books by score, filtered by filter backends of the view
         """
-        queryset = self.model.objects.all()
-        queryset = self.filter_queryset(queryset)
+        queryset = self.filter_queryset(self.model.objects.all())
+        return self.limit_queryset(queryset).order_by('-score', 'id')[:self.get_top_count()]
 
-        return queryset
+    def list_books(self):
+        """
+        Return serialized top books, always from the database
+        """
+        return self.get_serializer(self.get_queryset(), many=True).data
 
 
 class BookRetrieveMixin:
@@ -81,7 +142,7 @@ class BookRetrieveMixin:
         """
         book_id = kwargs['book_id']
         try:
-            return self.model.objects.get(book_id=book_id)
+            return self.limit_queryset(self.model.objects.all()).get(book_id=book_id)
         except self.model.DoesNotExist:
             raise BooksNotFound
 
@@ -89,40 +150,47 @@ class BookRetrieveMixin:
 class BookDownloader:
     source_url = "https://www.googleapis.com/books/v1/volumes?q="
 
-    def __init__(self, query):
+    # Not null columns without default, books missing them can only update existing rows
+    required_fields = ('published_date',)
+
+    def __init__(self, query=None, books=None, priority=INTERACTIVE, chunk_size=None, quarantine=False):
 
         # "q" parameter from POST body
         self.query = query
 
+        # Priority lane of upstream request, see bookject.core.utils.scheduler
+        self.priority = priority
+
         # A json response placeholder
         self.response = None
 
         # Dictionaries of books from json document and of book currently being created
-        self.books, self.book_dict = {}, {}
+        # Books may be provided upfront (eg. fetched by id), then no search request is sent
+        self.books, self.book_dict = books or {}, {}
 
-        # List of ids of books from json document
-        self.books_ids = []
+        # Book dictionaries of all books from json document by book_id
+        self.book_dicts = {}
 
         # Currently iterated book from json document
         self.book = None
 
-        # List of not existing and already existing in database books
-        self.existing, self.not_existing = [], []
-
         # URL from which json is downloaded
         self.url = self.source_url + (self.query or '')
 
-        # New books bulk insert manager
-        self.bulk_manager = BulkCreateManager()
+        # Number of books written in one transaction
+        self.chunk_size = chunk_size or settings.BOOKS_INGEST_CHUNK_SIZE
 
-        # List of books to update
-        self.objects_to_update = []
+        # Names of authors and categories of currently iterated book
+        self.authors, self.categories = [], []
 
-        # Lists of categories and authors from ManyToMany relations to add after saving objects
-        self.book_category_m2m_list, self.book_author_m2m_list = [], []
+        # Paths of already cached thumbnails by url and urls of thumbnails to cache after commit
+        self.cached_thumbnails, self.thumbnails_to_cache = {}, set()
 
-        # Lists of created/updated authors and categories (m2m relation of books)
-        self.authors, self.categories = [], []
+        # Skip incorrect books instead of failing, (book, error) pairs of skipped books
+        self.quarantine, self.quarantined = quarantine, []
+
+        # Books from json document by book_id, quarantined with their source
+        self.sources = {}
 
     def get_books(self):
         """
@@ -144,52 +212,60 @@ class BookDownloader:
     def get_information(self):
         """
         Get book information.
-        Create or update many 2 many relation objects.
         """
+        # Nothing may be carried over from the previous book
+        self.book_dict, self.authors, self.categories = {}, [], []
+
         self.book_dict['book_id'] = self.book['id']
 
         if 'title' in self.book['volumeInfo']:
             self.book_dict['title'] = self.book['volumeInfo']['title']
 
-        # When book is created, M2M related authors/categories need to be added later due to bulk insert
-        # When book is updated, authors/categories can be added immediately (no bulk operation)
-        # Authors/Categories to be added to self.book_dict later
+        # Duplicates would break m2m relation bulk insert
         if 'authors' in self.book['volumeInfo']:
-            self.authors = self.update_or_create_authors()
+            self.authors = list(dict.fromkeys(self.book['volumeInfo']['authors']))
         if 'categories' in self.book['volumeInfo']:
-            self.categories = self.update_or_create_categories()
+            self.categories = list(dict.fromkeys(self.book['volumeInfo']['categories']))
+
+        # Read model is written with the book row, in the same transaction as m2m relations
+        self.book_dict['authors_names'] = self.authors
+        self.book_dict['categories_names'] = self.categories
         if 'imageLinks' in self.book['volumeInfo']:
             if 'thumbnail' in self.book['volumeInfo']['imageLinks']:
                 self.book_dict['thumbnail'] = self.book['volumeInfo']['imageLinks']['thumbnail']
+                self.set_thumbnail_path()
         if 'publishedDate' in self.book['volumeInfo']:
             self.book_dict['published_date'] = self.get_published_date()
+            self.book_dict['published_year'] = self.book_dict['published_date'].strftime('%Y')
         if 'averageRating' in self.book['volumeInfo']:
             self.book_dict['average_rating'] = self.book['volumeInfo']['averageRating']
         if 'ratingsCount' in self.book['volumeInfo']:
             self.book_dict['ratings_count'] = self.book['volumeInfo']['ratingsCount']
 
-    def update_or_create_authors(self):
+        # Score of existing book without ratings in source is kept, see get_update_fields
+        self.book_dict['score'] = Book.get_score(
+            self.book_dict.get('average_rating'),
+            self.book_dict.get('ratings_count'),
+        )
+
+    def set_thumbnail_path(self):
         """
-        Update or create Author objects and return a list of these objects.
+        Point book to already cached copy of its thumbnail or mark thumbnail to be cached
         """
-        objects = []
-        authors = self.book['volumeInfo']['authors']
-        for author in authors:
-            obj, created = Author.objects.update_or_create(name=author)
-            objects.append(obj)
-
-        return objects
+        url = self.book_dict['thumbnail']
+        self.book_dict['thumbnail_path'] = self.cached_thumbnails.get(url, '')
+        if not self.book_dict['thumbnail_path']:
+            self.thumbnails_to_cache.add(url)
 
-    def update_or_create_categories(self):
+    def get_thumbnails_urls(self):
         """
-        Update or create Category objects and return a list of these objects.
+        Return thumbnails urls of books from json document
         """
-        objects = []
-        categories = self.book['volumeInfo']['categories']
-        for category in categories:
-            obj, created = Category.objects.update_or_create(name=category)
-            objects.append(obj)
-        return objects
+        return [
+            book['volumeInfo']['imageLinks']['thumbnail']
+            for book in self.books
+            if 'thumbnail' in book.get('volumeInfo', {}).get('imageLinks', {})
+        ]
 
     def get_published_date(self):
         """
@@ -212,167 +288,188 @@ class BookDownloader:
             logger.error(f'Incorrect published date "{published_date_str}" for book - {err}')
             raise IncorrectPublishedDateOfBook
 
-    def get_books_ids(self):
+    @staticmethod
+    def get_update_fields(book_dict):
         """
-        Get new books ids from book dict.
-        Purpose: To check later if already exists in the database
+        Return fields of already existing book to update - only fields provided in source.
         """
-        ids = []
-        for book in self.books:
-            if 'id' in book:
-                ids.append(book['id'])
-        return ids
+        fields = [field for field in book_dict if field != 'book_id']
+        if 'average_rating' not in book_dict:
+            fields.remove('score')
+        return fields
 
-    def get_existing(self):
+    def reject(self, book_dict, error):
         """
-        Return list of ids of already existing books in database
+        Quarantine book which can not be written, or raise BookParserException
         """
-        return list(Book.get_ids_which_already_exists(self.books_ids))
+        logger.error(f"Incorrect input data. {error}")
+        if not self.quarantine:
+            raise BookParserException
+        self.quarantined.append((self.sources[book_dict['book_id']], error))
 
-    def get_not_existing(self):
+    def get_chunks(self):
         """
-        Return list of ids of not existing yet books,
-        which is based on list of new and already existing books
+        Return lists of book dictionaries, written in separate transactions
         """
-        return [item for item in self.books_ids if item not in self.existing]
+        book_dicts = list(self.book_dicts.values())
+        return [book_dicts[i:i + self.chunk_size] for i in range(0, len(book_dicts), self.chunk_size)]
 
-    def create_new_books(self):
+    def upsert_books(self, book_dicts):
         """
-        Commit bulk inserts
+        Lock already existing books and insert new ones, which may be inserted by concurrent request meanwhile.
+        Books missing required fields are only written if they exist, other ones are rejected.
+        Return primary keys by book_id of written books and set of book_id of already existing books.
         """
-        self.bulk_manager.done()
+        # Existing rows are locked until the chunk is committed, in order of book_id and before any insert
+        pks = dict(
+            Book.objects.select_for_update()
+            .filter(book_id__in=[book_dict['book_id'] for book_dict in book_dicts])
+            .order_by('book_id')
+            .values_list('book_id', 'id')
+        )
+        existing = set(pks)
+
+        # NOT NULL constraints are checked before ON CONFLICT, so only complete books are inserted
+        new_books = []
+        for book_dict in book_dicts:
+            if book_dict['book_id'] in existing:
+                continue
+            missing = [field for field in self.required_fields if field not in book_dict]
+            if missing:
+                self.reject(book_dict, f"New book {book_dict['book_id']} misses {', '.join(missing)}")
+            else:
+                new_books.append(Book(**book_dict))
 
-    def create_m2m_book_authors(self):
-        """
-        Create many2many relation objects for authors of the books
-        """
-        BookAuthor = Book.authors.through
-        BookAuthor.objects.bulk_create(
-            [BookAuthor(
-                book_id=book.id,
-                author_id=author.id
-            )
-                for book, author in self.book_author_m2m_list]
+        rows = bulk_upsert(
+            new_books,
+            'book_id',
+            # Locks rows inserted meanwhile, auto_now is applied by bulk_upsert
+            update_fields=['modified_date', 'changed_date'],
+        )
+        for pk, book_id, inserted in rows:
+            pks[book_id] = pk
+            if not inserted:
+                existing.add(book_id)
+        return pks, existing
+
+    def update_existing_books(self, book_dicts, pks):
+        """
+        Commit bulk updates of existing books and drop their m2m relation objects,
+        which are created again with the new books ones.
+        """
+        if not book_dicts:
+            return
+
+        # Only fields provided in source are updated, so books are grouped by set of fields
+        # bulk_update does not apply auto_now, modified_date and changed_date are set explicitly
+        now = timezone.now()
+        books_by_fields = {}
+        for book_dict in book_dicts:
+            fields = self.get_update_fields(book_dict)
+            book = Book(id=pks[book_dict['book_id']], modified_date=now, changed_date=now)
+            for field in fields:
+                setattr(book, field, book_dict[field])
+            books_by_fields.setdefault(tuple(sorted(fields)), []).append(book)
+        for fields, books in books_by_fields.items():
+            Book.objects.bulk_update(books, [*fields, 'modified_date', 'changed_date'])
+
+        ids = [pks[book_dict['book_id']] for book_dict in book_dicts]
+        Book.authors.through.objects.filter(book_id__in=ids).delete()
+        Book.categories.through.objects.filter(book_id__in=ids).delete()
+
+    def create_m2m_objects(self, book_dicts, pks):
+        """
+        Create or get authors and categories and create many2many relation objects of the books
+        """
+        authors = bulk_get_or_create(
+            Author, 'name', [name for book_dict in book_dicts for name in book_dict['authors_names']]
+        )
+        categories = bulk_get_or_create(
+            Category, 'name', [name for book_dict in book_dicts for name in book_dict['categories_names']]
         )
-        self.book_author_m2m_list = []
 
-    def create_m2m_book_categories(self):
-        """
-            Create many2many relation objects for categories of the books
-        """
+        BookAuthor = Book.authors.through
+        BookAuthor.objects.bulk_create([
+            BookAuthor(book_id=pks[book_dict['book_id']], author_id=authors[name].id)
+            for book_dict in book_dicts
+            for name in book_dict['authors_names']
+        ])
         BookCategory = Book.categories.through
-        BookCategory.objects.bulk_create(
-            [BookCategory(
-                book_id=book.id,
-                category_id=category.id
+        BookCategory.objects.bulk_create([
+            BookCategory(book_id=pks[book_dict['book_id']], category_id=categories[name].id)
+            for book_dict in book_dicts
+            for name in book_dict['categories_names']
+        ])
+
+    def save_chunk(self, book_dicts):
+        """
+        Write chunk of books, their read model and m2m relations all or nothing.
+        Safe to run concurrently with other requests writing the same books, authors and categories.
+        """
+        # Every request writes books, authors and categories in this order and sorted, so locks do not deadlock
+        with transaction.atomic():
+            pks, existing = self.upsert_books(book_dicts)
+            book_dicts = [book_dict for book_dict in book_dicts if book_dict['book_id'] in pks]
+            self.update_existing_books(
+                [book_dict for book_dict in book_dicts if book_dict['book_id'] in existing], pks
             )
-                for book, category in self.book_category_m2m_list]
-        )
-        self.book_category_m2m_list = []
+            self.create_m2m_objects(book_dicts, pks)
 
-    def create_m2m_objects(self):
-        """
-        Create many2many relation objects of the books
-        """
-        self.create_m2m_book_authors()
-        self.create_m2m_book_categories()
-
-    def update_existing_book(self):
-        """
-        Update existing book.
-        Raise Http404 and BookDoesNotExists if book does not exists.
-        """
-        try:
-            # Try to get book object to update - raise an exception failed
-            updated_book = get_object_or_404(Book, book_id=self.book_dict['book_id'])
-            # Update modified book
-            for attr, value in self.book_dict.items():
-                setattr(updated_book, attr, value)
-            updated_book.save()
-
-            # Update m2m relations
-            updated_book.authors.set(self.authors)
-            updated_book.categories.set(self.categories)
-
-        except Http404 as err:
-            logger.error(f"Book {self.book_dict['id']} does not exists - {err}")
-            raise BookDoesNotExists
-
-    def manage_not_existing_book(self):
-        """
-        Manage not existing yet book:
-        - create new book and add to bulk manager
-        - commit with bulk create if batch size is exceeded
-        """
-        # Create new Book object, wait with commit
-        new_book = Book(**self.book_dict)
-
-        # Add newly created book to bulk insert manager
-        # Commit when batch chuck size exceeded (init parameter)
-        # Else add book to waiting queue
-        self.bulk_manager.add(new_book)
-
-        # Add authors and categories to m2m lists in order to create object
-        self.set_m2m_lists(new_book)
-
-    def manage_existing_book(self):
-        """
-        Set M2M fields (authors, categories) and update existing book
-        """
-        self.update_existing_book()
+            # Catalog indexes of all processes pick up the chunk
+            transaction.on_commit(CatalogVersion.bump)
 
     def set_response(self):
-        self.response = get_response(self.url)
-
-    def set_books_ids(self):
-        self.books_ids = self.get_books_ids()
+        self.response = get_response(self.url, priority=self.priority)
 
     def set_books(self):
-        self.books = self.get_books()
+        if not self.books:
+            self.books = self.get_books()
 
-    def set_existing_books(self):
-        self.existing = self.get_existing()
-
-    def set_not_existing_books(self):
-        self.not_existing = self.get_not_existing()
-
-    def set_m2m_lists(self, new_book):
-        self.book_author_m2m_list += [[new_book, author] for author in self.authors]
-        self.book_category_m2m_list += [[new_book, category] for category in self.categories]
-
-    def perform_create(self):
+    def set_book_dicts(self):
         """
-        Create/update books on two ways.
-        Logic split into operations on existing and new books duo performance improvement
+        Gather information of all books before anything is written - missing anything critical breaks iteration,
+        unless incorrect books are quarantined
         """
-        self.set_books()  # Try to get books from source and raise BooksNotFound if failed
-        self.set_books_ids()  # Get ids of all new books
-        self.set_existing_books()  # Mark already existing books
-        self.set_not_existing_books()  # Mark new books
-
-        # Gather book information in loop
         for book in self.books:
             self.book = book
-
-            # Get book data - missing anything critical breaks iteration
             try:
                 self.get_information()
             except KeyError as err:
                 logger.error(f"Incorrect input data. Critical book data is not provided - {err}")
-                raise BookParserException
+                if not self.quarantine:
+                    raise BookParserException
+                self.quarantined.append((book, f"Critical book data is not provided - {err}"))
+                continue
+            except IncorrectPublishedDateOfBook as err:
+                if not self.quarantine:
+                    raise
+                self.quarantined.append((book, f"{err.detail} - {book['volumeInfo']['publishedDate']}"))
+                continue
+            # The same book may be listed twice, last one wins
+            self.book_dicts[self.book_dict['book_id']] = self.book_dict
+            self.sources[self.book_dict['book_id']] = book
+
+    def set_cached_thumbnails(self):
+        self.cached_thumbnails = get_cached_thumbnails(self.get_thumbnails_urls())
+
+    def schedule_thumbnails(self):
+        if settings.BOOKS_THUMBNAILS['ENABLED'] and self.thumbnails_to_cache:
+            urls = list(self.thumbnails_to_cache)
+            transaction.on_commit(lambda: schedule_thumbnails(urls))
 
-            if self.book_dict['book_id'] in self.existing:
-                self.manage_existing_book()
-            else:
-                self.manage_not_existing_book()
+    def perform_create(self):
+        """
+        Create/update books with database upserts, in transactions of chunk_size books.
+        """
+        self.set_books()  # Try to get books from source and raise BooksNotFound if failed
+        self.set_cached_thumbnails()  # Mark books which may use already cached thumbnails
+        self.set_book_dicts()  # Gather book information
 
-        # Try to bulk create new books and m2m relation objects if new books exist
-        # New objects could be already created if batch size was reached
-        if self.not_existing:
-            self.create_new_books()
+        for chunk in self.get_chunks():
+            self.save_chunk(chunk)
 
-            # Create authors and categories ManyToMany relation objects and add to M2M lists.
-            self.create_m2m_objects()
+        # Download thumbnails in the background once books are committed
+        self.schedule_thumbnails()
 
 
 class BookCreateUpdateMixin(object):
@@ -391,6 +488,13 @@ class BookCreateUpdateMixin(object):
             raise InvalidQueryParameterInBody
         return query
 
+    @staticmethod
+    def normalize_query(query):
+        """
+        Return query with collapsed whitespace and letter case, queries equal after normalization give the same books
+        """
+        return ' '.join(query.split()).casefold()
+
     def create_or_update(self, request, *args, **kwargs):
         """
         Process request to create/update books.
@@ -399,8 +503,10 @@ class BookCreateUpdateMixin(object):
         # Get query "q" parameter. May raise InvalidQueryParameterInBody exception
         query = self.get_parameter(request)
 
-        # Proper create/update operation
-        BookDownloader(query=query).perform_create()
+        # Proper create/update operation, joined by concurrent requests with the same query
+        key = self.normalize_query(query)
+        ingestions.do(key, shared_ingestions.do, key, BookDownloader(query=query).perform_create)
 
         # Return success response with 201 code if books has been created/updated
-        return Response(f"Success: q={query}", status=status.HTTP_201_CREATED)
+        # Following reads of the client go to primary until replicas catch up
+        return pin_to_primary(Response(f"Success: q={query}", status=status.HTTP_201_CREATED))
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import F
 
 
 class Category(models.Model):
@@ -42,15 +44,167 @@ class Book(models.Model):
     )
     thumbnail = models.URLField(
         max_length=500,
+        # Books sharing thumbnail share its cached copy
+        db_index=True,
+    )
+    # Path of thumbnail cached under MEDIA_ROOT, empty until cached
+    thumbnail_path = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+    )
+    # Denormalized read model maintained by BookDownloader, served by BookReadSerializer without joins
+    authors_names = models.JSONField(
+        default=list,
+    )
+    categories_names = models.JSONField(
+        default=list,
+    )
+    published_year = models.CharField(
+        max_length=4,
+        default='',
+    )
+    # Bayesian-weighted rating computed at write time, see get_score
+    score = models.FloatField(
+        default=0,
+    )
+    # Failed refreshes since the last successful one, the book is not refreshed again before refresh_retry_date
+    refresh_failures = models.PositiveSmallIntegerField(
+        default=0,
+    )
+    refresh_retry_date = models.DateTimeField(
+        null=True,
+        blank=True,
     )
     created_date = models.DateTimeField(
         auto_now_add=True,
     )
     modified_date = models.DateTimeField(
         auto_now=True,
+        # Stale books are refreshed in order of modified_date
+        db_index=True,
+    )
+    # Last change of served data, also when thumbnail gets cached, which is not a refresh from the source.
+    # Catalog indexes patch in books changed since their last check
+    changed_date = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
     )
 
+    class Meta:
+        indexes = [
+            # Top-N books are the first N entries of these indexes
+            models.Index(fields=['-score', 'id'], name='book_score_idx'),
+            models.Index(fields=['published_year', '-score', 'id'], name='book_year_score_idx'),
+            # Filters of BookFilterSet
+            models.Index(fields=['published_date'], name='book_published_date_idx'),
+            models.Index(fields=['average_rating'], name='book_rating_idx'),
+            models.Index(fields=['ratings_count'], name='book_ratings_count_idx'),
+            models.Index(fields=['title'], name='book_title_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    @staticmethod
+    def get_score(average_rating, ratings_count):
+        """
+        Return average rating weighted towards BOOKS_SCORE_PRIOR_MEAN,
+        as if every book had additional BOOKS_SCORE_PRIOR_COUNT ratings of that value
+        """
+        prior_mean, prior_count = settings.BOOKS_SCORE_PRIOR_MEAN, settings.BOOKS_SCORE_PRIOR_COUNT
+        ratings_count = ratings_count or 0
+        average_rating = average_rating or 0
+        return (prior_count * prior_mean + ratings_count * average_rating) / (prior_count + ratings_count)
+
     @staticmethod
     def get_ids_which_already_exists(ids):
         return Book.objects.filter(book_id__in=ids).values_list('book_id', flat=True)
 
+
+class CatalogVersion(models.Model):
+    """
+    Single row counter of catalog changes, bumped after books are written.
+    Catalog index of each process patches itself when the version changes, see bookject.books.catalog
+    """
+    version = models.PositiveBigIntegerField(
+        default=0,
+    )
+    # Version of the last change which can not be patched by changed_date (eg. read model rebuild)
+    full_version = models.PositiveBigIntegerField(
+        default=0,
+    )
+
+    @classmethod
+    def get_versions(cls):
+        """
+        Return current version and version of the last change which needs full rebuild of the index
+        """
+        return cls.objects.filter(pk=1).values_list('version', 'full_version').first() or (0, 0)
+
+    @classmethod
+    def bump(cls, full=False):
+        """
+        Increment version, and mark it as needing full rebuild of the index if `full`
+        """
+        fields = {'version': F('version') + 1}
+        if full:
+            fields['full_version'] = F('version') + 1
+        if not cls.objects.filter(pk=1).update(**fields):
+            cls.objects.get_or_create(pk=1)
+            cls.objects.filter(pk=1).update(**fields)
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of paginated import of search results, updated in the transaction of each imported chunk.
+    See bookject.books.importer
+    """
+    query = models.CharField(
+        max_length=200,
+        unique=True,
+    )
+    page_size = models.PositiveSmallIntegerField()
+    # Page being imported, its items up to position (last_book_id) are already processed
+    page_index = models.PositiveIntegerField(
+        default=0,
+    )
+    position = models.PositiveSmallIntegerField(
+        default=0,
+    )
+    last_book_id = models.CharField(
+        max_length=12,
+        blank=True,
+        default='',
+    )
+    imported = models.PositiveIntegerField(
+        default=0,
+    )
+    quarantined = models.PositiveIntegerField(
+        default=0,
+    )
+    finished = models.BooleanField(
+        default=False,
+    )
+    created_date = models.DateTimeField(
+        auto_now_add=True,
+    )
+    modified_date = models.DateTimeField(
+        auto_now=True,
+    )
+
+
+class QuarantinedBook(models.Model):
+    """
+    Incorrect book from the source skipped by import, kept with the error for inspection
+    """
+    query = models.CharField(
+        max_length=200,
+        blank=True,
+    )
+    book_id = models.CharField(
+        max_length=200,
+        blank=True,
+    )
+    data = models.JSONField()
+    error = models.TextField()
+    created_date = models.DateTimeField(
+        auto_now_add=True,
+    )
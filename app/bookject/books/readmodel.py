@@ -0,0 +1,74 @@
+import logging
+
+from .models import Book, CatalogVersion
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+READ_MODEL_FIELDS = ['authors_names', 'categories_names', 'published_year', 'score']
+
+
+def get_related_names(through, related_field, books_ids):
+    """
+    Return names of related objects by book id, in order in which relations have been created
+    """
+    names = {book_id: [] for book_id in books_ids}
+    relations = through.objects.filter(book_id__in=books_ids) \
+                               .order_by('id') \
+                               .values_list('book_id', f'{related_field}__name')
+    for book_id, name in relations:
+        names[book_id].append(name)
+    return names
+
+
+def get_read_model(books):
+    """
+    Return expected read model values by book id, computed from normalized rows
+    """
+    ids = [book.id for book in books]
+    authors = get_related_names(Book.authors.through, 'author', ids)
+    categories = get_related_names(Book.categories.through, 'category', ids)
+    return {
+        book.id: {
+            'authors_names': authors[book.id],
+            'categories_names': categories[book.id],
+            'published_year': book.published_date.strftime('%Y'),
+            'score': Book.get_score(book.average_rating, book.ratings_count),
+        }
+        for book in books
+    }
+
+
+def rebuild_read_model(check=False, batch_size=1000):
+    """
+    Compare read model with normalized rows in batches and fix inconsistent books, unless only checking.
+    Return dictionary with number of checked and inconsistent books and ids of the first inconsistent ones.
+    """
+    stats = {'checked': 0, 'inconsistent': 0, 'examples': []}
+    queryset = Book.objects.only('id', 'published_date', 'average_rating', 'ratings_count', *READ_MODEL_FIELDS) \
+                           .order_by('id')
+    last_id = 0
+    while True:
+        books = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not books:
+            if stats['inconsistent'] and not check:
+                # Rebuilt books keep changed_date, catalog indexes can not patch them
+                CatalogVersion.bump(full=True)
+            return stats
+        last_id = books[-1].id
+
+        expected = get_read_model(books)
+        inconsistent = []
+        for book in books:
+            values = expected[book.id]
+            if any(getattr(book, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(book, field, value)
+                inconsistent.append(book)
+
+        stats['checked'] += len(books)
+        stats['inconsistent'] += len(inconsistent)
+        stats['examples'] += [book.id for book in inconsistent][:10 - len(stats['examples'])]
+        if inconsistent and not check:
+            Book.objects.bulk_update(inconsistent, READ_MODEL_FIELDS)
+            logger.info(f"Read model of {len(inconsistent)} books rebuilt")
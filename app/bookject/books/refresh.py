@@ -0,0 +1,175 @@
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from ..core.exceptions import GetResponseError, ResponseDeserializationError
+from ..core.models import UsageCounter
+from ..core.utils import deserialize_response, get_response, BULK
+from .mixins import BookDownloader
+from .models import Book
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# How many of the oldest books are considered when picking a batch by priority
+CANDIDATES_FACTOR = 5
+
+
+class HourlyBudget(object):
+    """
+    Count upstream requests of the refresh per hour in the database, shared by all processes and runs.
+    """
+
+    def __init__(self, limit, key_prefix='refresh-budget'):
+        self.limit = limit
+        self.key_prefix = key_prefix
+
+    def get_key(self):
+        return f"{self.key_prefix}:{timezone.now().strftime('%Y-%m-%dT%H')}"
+
+    def take(self, count):
+        """
+        Take up to `count` requests from the budget and return how many have been granted
+        """
+        if not self.limit:
+            return count
+        key, expires_date = self.get_key(), timezone.now() + timedelta(hours=2)
+        used = UsageCounter.increment(key, count, expires_date)
+        granted = max(0, min(count, self.limit - (used - count)))
+        if granted < count:
+            # Give back what has not been granted, so the counter reflects sent requests
+            UsageCounter.increment(key, granted - count, expires_date)
+        return granted
+
+    def get_remaining(self):
+        if not self.limit:
+            return None
+        return max(0, self.limit - UsageCounter.get_count(self.get_key()))
+
+
+class BookRefresher(object):
+    """
+    Refresh stale books from the source by book_id.
+    Oldest books go first, books with more ratings are preferred among them.
+    """
+    source_url = "https://www.googleapis.com/books/v1/volumes/"
+
+    def __init__(self, batch_size=None, hourly_budget=None, stale_after=None):
+        options = getattr(settings, 'BOOKS_REFRESH', {})
+        self.batch_size = batch_size or options.get('BATCH_SIZE', 40)
+        self.budget = HourlyBudget(options.get('HOURLY_BUDGET', 200) if hourly_budget is None else hourly_budget)
+        self.stale_after = options.get('STALE_AFTER', 24 * 60 * 60) if stale_after is None else stale_after
+        self.retry_after = options.get('RETRY_AFTER', 60 * 60)
+        self.concurrency = options.get('CONCURRENCY', 4)
+
+    @staticmethod
+    def get_priority(book, now):
+        """
+        Return refresh priority of book - age in seconds weighted by number of ratings
+        """
+        age = (now - book.modified_date).total_seconds()
+        return age * (1 + math.log1p(book.ratings_count or 0))
+
+    def get_stale_books(self, limit):
+        """
+        Return up to `limit` stale books which should be refreshed first, skipping books waiting to be retried
+        """
+        now = timezone.now()
+        candidates = list(
+            Book.objects.filter(modified_date__lt=now - timedelta(seconds=self.stale_after))
+                        .filter(Q(refresh_retry_date__isnull=True) | Q(refresh_retry_date__lte=now))
+                        .only('id', 'book_id', 'ratings_count', 'modified_date', 'refresh_failures')
+                        .order_by('modified_date')[:limit * CANDIDATES_FACTOR]
+        )
+        candidates.sort(key=lambda book: self.get_priority(book, now), reverse=True)
+        return candidates[:limit]
+
+    def fetch_volume(self, book_id):
+        """
+        Return source json of the book or None if it could not be fetched.
+        Runs in executor thread, whose connection used by the scheduler is given back to the pool.
+        """
+        try:
+            return deserialize_response(get_response(self.source_url + book_id, priority=BULK))
+        except (GetResponseError, ResponseDeserializationError):
+            logger.error(f"Failed to refresh book {book_id}")
+            return None
+        finally:
+            connections.close_all()
+
+    def refresh_batch(self):
+        """
+        Refresh one batch of stale books within the hourly budget.
+        Return dictionary of refreshed/failed/requested counts.
+        """
+        books = self.get_stale_books(self.batch_size)
+        limit = self.budget.take(len(books)) if books else 0
+        stats = {'requested': limit, 'refreshed': 0, 'failed': 0}
+        if not limit:
+            if books:
+                logger.info("Hourly refresh budget used up")
+            return stats
+
+        books = books[:limit]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            volumes = list(executor.map(self.fetch_volume, [book.book_id for book in books]))
+
+        refreshed = [volume for book, volume in zip(books, volumes) if volume and volume.get('id') == book.book_id]
+        if refreshed:
+            try:
+                BookDownloader(books=refreshed, priority=BULK).perform_create()
+            except APIException as err:
+                logger.error(f"Failed to save refreshed books - {err}")
+                refreshed = []
+
+        refreshed_ids = {volume['id'] for volume in refreshed}
+        failed = [book for book in books if book.book_id not in refreshed_ids]
+        self.postpone(failed)
+        Book.objects.filter(book_id__in=refreshed_ids, refresh_failures__gt=0).update(
+            refresh_failures=0, refresh_retry_date=None,
+        )
+
+        stats.update(refreshed=len(refreshed), failed=len(failed))
+        return stats
+
+    def postpone(self, books):
+        """
+        Retry books which failed to refresh later, so they do not block the rest. They keep modified_date,
+        so they still count as stale. Delay doubles with each failure, up to stale_after.
+        """
+        books_by_failures = {}
+        for book in books:
+            books_by_failures.setdefault(book.refresh_failures + 1, []).append(book.id)
+        now = timezone.now()
+        for failures, ids in books_by_failures.items():
+            delay = min(self.stale_after, self.retry_after * 2 ** (failures - 1))
+            Book.objects.filter(id__in=ids).update(
+                refresh_failures=failures, refresh_retry_date=now + timedelta(seconds=delay),
+            )
+
+
+def get_catalog_lag(stale_after):
+    """
+    Return staleness metrics of the catalog: number of books, number of books not refreshed
+    for `stale_after` seconds and of books whose last refresh failed, age of the oldest and of the median book
+    in seconds.
+    """
+    now = timezone.now()
+    books = Book.objects.order_by('modified_date').values_list('modified_date', flat=True)
+    total = books.count()
+    if not total:
+        return {'books': 0, 'stale': 0, 'failing': 0, 'oldest_age': 0, 'median_age': 0}
+    return {
+        'books': total,
+        'stale': books.filter(modified_date__lt=now - timedelta(seconds=stale_after)).count(),
+        'failing': books.filter(refresh_failures__gt=0).count(),
+        'oldest_age': int((now - books[0]).total_seconds()),
+        'median_age': int((now - books[total // 2]).total_seconds()),
+    }
@@ -1,3 +1,558 @@
-from django.test import TestCase
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection, connections
+import requests
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .filters import BookFilterSet
+from . import thumbnails
+from .apiv1.serializers import BookReadSerializer, BookSerializer
+from .catalog import CatalogIndex
+from .exceptions import BookParserException
+from .importer import BookImporter
+from .mixins import BookDownloader
+from .readmodel import rebuild_read_model
+from .models import Book, CatalogVersion, QuarantinedBook
+from .refresh import BookRefresher, HourlyBudget, get_catalog_lag
+from ..core.db.pool import get_pools_stats
+from ..core.models import UsageCounter
+
+
+def get_volume(number, authors, categories, published_date, rating=None):
+    volume_info = {
+        'title': f'Title {number}',
+        'authors': authors,
+        'categories': categories,
+        'publishedDate': published_date,
+        'imageLinks': {'thumbnail': f'http://books.example.com/{number}.jpg'},
+    }
+    if rating is not None:
+        volume_info.update(averageRating=rating, ratingsCount=number)
+    return {'id': f'book{number}', 'volumeInfo': volume_info}
+
+
+class BookFilterSetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BookDownloader(books=[
+            get_volume(1, ['Ann Smith', 'Anna Smith'], ['Fiction'], '1999', 4.5),
+            get_volume(2, ['Bob Brown'], ['Fiction', 'History'], '2005-03', 3.0),
+            get_volume(3, ['Ann Smith'], ['History'], '2010-01-02'),
+        ]).perform_create()
+
+    def filter(self, query):
+        request = RequestFactory().get(f'/books?{query}')
+        return BookFilterSet(request.GET, queryset=Book.objects.order_by('book_id')).qs
+
+    def explain(self, queryset):
+        with connection.cursor() as cursor:
+            # Test tables are tiny, so the planner would scan them anyway
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN {sql}', params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def assertBooks(self, query, book_ids):
+        self.assertEqual(list(self.filter(query).values_list('book_id', flat=True)), book_ids)
+
+    def test_filters(self):
+        self.assertBooks('author=ann', ['book1', 'book3'])
+        self.assertBooks('author=bob&author=anna', ['book1', 'book2'])
+        self.assertBooks('category=fiction', ['book1', 'book2'])
+        self.assertBooks('category=history&author=ann', ['book3'])
+        self.assertBooks('published_date=1999&published_date=2010', ['book1', 'book3'])
+        self.assertBooks('min_year=2000&max_year=2005', ['book2'])
+        self.assertBooks('min_rating=4', ['book1'])
+        self.assertBooks('min_ratings_count=2', ['book2'])
+        self.assertBooks('title=Title%202', ['book2'])
+        self.assertBooks('title=title', [])
+
+    def test_single_statement_without_joins(self):
+        sql = str(self.filter('author=ann&category=fiction&min_rating=1').query)
+        self.assertEqual(sql.count('EXISTS'), 2)
+        self.assertNotIn('JOIN "books_book_authors"', sql.split('WHERE')[0])
+        self.assertNotIn('JOIN "books_book_categories"', sql.split('WHERE')[0])
+
+    def test_query_plans_use_indexes(self):
+        plans = {
+            'title=Title': 'book_title_prefix_idx',
+            'min_year=2000&max_year=2005': 'book_published_date_idx',
+            'published_date=1999&published_date=2010': 'book_published_date_idx',
+            'min_rating=4': 'book_rating_idx',
+            'min_ratings_count=2': 'book_ratings_count_idx',
+        }
+        for query, index in plans.items():
+            with self.subTest(query=query):
+                plan = self.explain(self.filter(query).order_by())
+                self.assertIn(index, plan)
+
+
+@override_settings(RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=False))
+class BookDownloaderTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BookDownloader(books=[get_volume(1, ['Ann Smith'], ['Fiction'], '1999', 4.5)]).perform_create()
+
+    def get_volume_without_date(self, number):
+        volume = get_volume(number, ['Bob Brown'], ['History'], None, 3.0)
+        del volume['volumeInfo']['publishedDate']
+        return volume
+
+    def test_updates_existing_book_missing_required_fields(self):
+        BookDownloader(books=[self.get_volume_without_date(1)]).perform_create()
+        book = Book.objects.get(book_id='book1')
+        self.assertEqual((book.published_year, book.authors_names, book.average_rating), ('1999', ['Bob Brown'], 3.0))
+        self.assertGreater(book.modified_date, book.created_date)
+        self.assertEqual([author.name for author in book.authors.all()], ['Bob Brown'])
+
+    def test_rejects_new_book_missing_required_fields(self):
+        with self.assertRaises(BookParserException):
+            BookDownloader(books=[self.get_volume_without_date(2)]).perform_create()
+        self.assertFalse(Book.objects.filter(book_id='book2').exists())
+
+        downloader = BookDownloader(books=[
+            self.get_volume_without_date(2), get_volume(3, ['Ann Smith'], ['Fiction'], '2001'),
+        ], quarantine=True)
+        downloader.perform_create()
+        self.assertEqual([book['id'] for book, error in downloader.quarantined], ['book2'])
+        self.assertEqual(list(Book.objects.order_by('book_id').values_list('book_id', flat=True)), ['book1', 'book3'])
+
+
+class CatalogIndexTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BookDownloader(books=[
+            get_volume(1, ['Ann Smith'], ['Fiction'], '1999', 4.5),
+            get_volume(2, ['Bob Brown'], ['History'], '2005'),
+        ]).perform_create()
+
+    def setUp(self):
+        self.index = CatalogIndex(BookReadSerializer, dict(
+            settings.BOOKS_CATALOG_INDEX, CHECK_INTERVAL=0, REBUILD_INTERVAL=60 * 60,
+        ))
+        self.snapshot = self.index.get_snapshot()
+
+    def search(self, snapshot, **kwargs):
+        return [book['book_id'] for book in snapshot.search(**kwargs)]
+
+    def test_patch_copies_only_changed_structures(self):
+        CatalogVersion.bump()
+        patched = self.index.get_snapshot()
+        self.assertIsNot(patched, self.snapshot)
+        # Books within the patch overlap did not change
+        self.assertFalse(any(getattr(patched, name) is not getattr(self.snapshot, name)
+                             for name in patched.structures))
+
+        BookDownloader(books=[get_volume(2, ['Ann Smith'], ['History'], '2006')]).perform_create()
+        CatalogVersion.bump()
+        patched = self.index.get_snapshot()
+        self.assertEqual(self.search(patched, authors=['smith']), ['book1', 'book2'])
+        self.assertEqual(self.search(patched, years=[2006]), ['book2'])
+        self.assertIs(patched.trigrams, self.snapshot.trigrams)
+        # Snapshot in use by other requests is not changed
+        self.assertEqual(self.search(self.snapshot, authors=['smith']), ['book1'])
+        self.assertEqual(self.search(self.snapshot, years=[2005]), ['book2'])
+
+        # New author shares trigram sets with existing ones
+        BookDownloader(books=[get_volume(3, ['Ann Smithers'], ['History'], '2007')]).perform_create()
+        CatalogVersion.bump()
+        self.assertEqual(self.search(self.index.get_snapshot(), authors=['smithers']), ['book3'])
+        self.assertEqual(self.search(self.snapshot, authors=['smithers']), [])
+        self.assertEqual(self.snapshot.trigrams['MIT'], {'ANN SMITH'})
+
+    def test_cached_thumbnail_is_patched_in(self):
+        response = mock.Mock(content=b'image', headers={'Content-Type': 'image/jpeg'})
+        # Connection of executor thread is closed, the test one must not be
+        with mock.patch.object(thumbnails, 'download_thumbnail', return_value=response), \
+                mock.patch.object(thumbnails, 'store_thumbnail', return_value='thumbnails/ab/ab.jpg'), \
+                mock.patch.object(thumbnails, 'close_old_connections'):
+            thumbnails.cache_thumbnail('http://books.example.com/1.jpg')
+
+        book = self.index.get_snapshot().search(authors=['smith'], fields=['thumbnail'])[0]
+        self.assertEqual(book['thumbnail'], '/media/thumbnails/ab/ab.jpg')
+
+
+class StubImporter(BookImporter):
+    """
+    Importer reading pages from a list, interrupted when writing chunk number `fail_at`
+    """
+
+    def __init__(self, query, pages, fail_at=None, **kwargs):
+        self.pages, self.fail_at = pages, fail_at
+        self.requested, self.written = [], []
+        super().__init__(query, **kwargs)
+
+    def get_page(self, page_index):
+        self.requested.append(page_index)
+        items = self.pages[page_index] if page_index < len(self.pages) else []
+        return items, sum(map(len, self.pages))
+
+    def write(self, items):
+        if len(self.written) == self.fail_at:
+            raise RuntimeError("Interrupted")
+        quarantined = super().write(items)
+        self.written.append([item['id'] for item in items])
+        return quarantined
+
+
+class BookImporterTest(TestCase):
+
+    def setUp(self):
+        volumes = [get_volume(number, ['Ann Smith'], ['Fiction'], '2001') for number in range(1, 11)]
+        volumes[5] = get_volume(6, ['Ann Smith'], ['Fiction'], 'abc')
+        # Second page is short although it is not the last one
+        self.pages = [volumes[:4], volumes[4:7], volumes[7:]]
+
+    def get_importer(self, **kwargs):
+        return StubImporter('smith', self.pages, page_size=4, chunk_size=2, **kwargs)
+
+    def test_resumes_after_interrupted_chunk(self):
+        importer = self.get_importer(fail_at=3)
+        with self.assertRaises(RuntimeError):
+            importer.run()
+        checkpoint = importer.checkpoint
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.page_index, checkpoint.position, checkpoint.last_book_id), (1, 2, 'book6'))
+
+        resumed = self.get_importer()
+        checkpoint = resumed.run()
+        self.assertEqual(importer.written + resumed.written, [
+            ['book1', 'book2'], ['book3', 'book4'], ['book5', 'book6'], ['book7'], ['book8', 'book9'], ['book10'],
+        ])
+        # Import ends at totalItems, without requesting an empty page
+        self.assertEqual(resumed.requested, [1, 2])
+        self.assertEqual((checkpoint.finished, checkpoint.imported, checkpoint.quarantined), (True, 9, 1))
+        self.assertEqual(Book.objects.count(), 9)
+        self.assertEqual(list(QuarantinedBook.objects.values_list('query', 'book_id')), [('smith', 'book6')])
+
+    def test_restart_drops_quarantined_books(self):
+        self.get_importer().run()
+        checkpoint = self.get_importer(restart=True).run()
+        self.assertEqual((checkpoint.imported, checkpoint.quarantined), (9, 1))
+        self.assertEqual(QuarantinedBook.objects.filter(query='smith').count(), 1)
+
+
+@override_settings(BOOKS_REFRESH=dict(settings.BOOKS_REFRESH, RETRY_AFTER=60 * 60, STALE_AFTER=24 * 60 * 60))
+class BookRefresherTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BookDownloader(books=[
+            get_volume(1, ['Ann Smith'], ['Fiction'], '1999'),
+            get_volume(2, ['Bob Brown'], ['History'], '2005', 4.0),
+            get_volume(3, ['Ann Smith'], ['History'], '2010'),
+            get_volume(4, ['Bob Brown'], ['Fiction'], '2011'),
+        ]).perform_create()
+        now = timezone.now()
+        # Book 2 has 2 ratings, book 4 is fresh
+        for book_id, age in [('book1', 3), ('book2', 2), ('book3', 2.5), ('book4', 0.5)]:
+            Book.objects.filter(book_id=book_id).update(modified_date=now - timedelta(days=age))
+
+    def get_book_ids(self, books):
+        return [book.book_id for book in books]
+
+    def test_oldest_and_most_rated_books_go_first(self):
+        refresher = BookRefresher(hourly_budget=0)
+        # Age of book 2 weighted by ratings count outweighs older books without ratings
+        self.assertEqual(self.get_book_ids(refresher.get_stale_books(10)), ['book2', 'book1', 'book3'])
+        self.assertEqual(self.get_book_ids(refresher.get_stale_books(1)), ['book2'])
+
+    def test_hourly_budget_grants_part_of_batch(self):
+        budget = HourlyBudget(5)
+        self.assertEqual([budget.take(3), budget.take(3), budget.take(3)], [3, 2, 0])
+        self.assertEqual(budget.get_remaining(), 0)
+        self.assertEqual(UsageCounter.get_count(budget.get_key()), 5)
+        self.assertEqual(HourlyBudget(0).take(3), 3)
+
+    def test_failed_books_are_retried_later_with_backoff(self):
+        refresher = BookRefresher(hourly_budget=0)
+        Book.objects.filter(book_id='book3').update(refresh_failures=5)
+        start = timezone.now()
+        refresher.postpone(Book.objects.filter(book_id__in=['book1', 'book3']))
+
+        book1, book3 = Book.objects.filter(book_id__in=['book1', 'book3']).order_by('book_id')
+        self.assertEqual((book1.refresh_failures, book3.refresh_failures), (1, 6))
+        self.assertAlmostEqual((book1.refresh_retry_date - start).total_seconds(), 60 * 60, delta=5)
+        # 32 hours of the sixth failure are capped by stale_after
+        self.assertAlmostEqual((book3.refresh_retry_date - start).total_seconds(), 24 * 60 * 60, delta=5)
+        self.assertEqual(self.get_book_ids(refresher.get_stale_books(10)), ['book2'])
+
+    def test_catalog_lag(self):
+        Book.objects.filter(book_id='book1').update(refresh_failures=1)
+        lag = get_catalog_lag(24 * 60 * 60)
+        self.assertEqual((lag['books'], lag['stale'], lag['failing']), (4, 3, 1))
+        self.assertAlmostEqual(lag['oldest_age'], 3 * 24 * 60 * 60, delta=5)
+        self.assertAlmostEqual(lag['median_age'], 2 * 24 * 60 * 60, delta=5)
+
+    def test_fetch_threads_give_connections_back(self):
+        def get_response(url, priority):
+            # Scheduler writes its shared state through the connection of the thread
+            UsageCounter.get_count('refresh-test')
+            return mock.Mock(json=lambda: {'id': url.rsplit('/', 1)[-1]})
+
+        refresher = BookRefresher(hourly_budget=0)
+        in_use = sum(stats['in_use'] for stats in get_pools_stats().values())
+        with mock.patch('bookject.books.refresh.get_response', side_effect=get_response):
+            for batch in range(3):
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    volumes = list(executor.map(refresher.fetch_volume, ['book1', 'book2']))
+                self.assertEqual(volumes, [{'id': 'book1'}, {'id': 'book2'}])
+        self.assertEqual(sum(stats['in_use'] for stats in get_pools_stats().values()), in_use)
+
+
+class ReadModelTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BookDownloader(books=[
+            get_volume(1, ['Ann Smith', 'Anna Smith'], ['Fiction', 'History'], '1999-05-03', 4.5),
+            get_volume(2, ['Bob Brown'], [], '2005-03'),
+            get_volume(3, [], ['History'], '2010', 3.0),
+        ]).perform_create()
+        # Update reorders authors and categories
+        BookDownloader(books=[
+            get_volume(1, ['Anna Smith', 'Ann Smith'], ['History', 'Fiction'], '1999-05-03', 4.0),
+        ]).perform_create()
+
+    def test_read_model_serializes_like_normalized_rows(self):
+        prefetches = BookSerializer.get_prefetches(BookSerializer.Meta.fields)
+        for book in Book.objects.prefetch_related(*prefetches).order_by('book_id'):
+            self.assertEqual(BookReadSerializer(book).data, BookSerializer(book).data)
+        book = Book.objects.get(book_id='book1')
+        self.assertEqual(BookReadSerializer(book).data['authors'], [{'name': 'Anna Smith'}, {'name': 'Ann Smith'}])
+
+    def test_rebuild_read_model_fixes_inconsistent_books(self):
+        book = Book.objects.get(book_id='book2')
+        Book.objects.filter(id=book.id).update(authors_names=['Somebody'], published_year='1900')
+        versions = CatalogVersion.get_versions()
+
+        stats = rebuild_read_model(check=True)
+        self.assertEqual(stats, {'checked': 3, 'inconsistent': 1, 'examples': [book.id]})
+        self.assertEqual(Book.objects.get(id=book.id).authors_names, ['Somebody'])
+        self.assertEqual(CatalogVersion.get_versions(), versions)
+
+        self.assertEqual(rebuild_read_model(batch_size=2)['inconsistent'], 1)
+        book.refresh_from_db()
+        self.assertEqual((book.authors_names, book.published_year), (['Bob Brown'], '2005'))
+        self.assertEqual(rebuild_read_model(check=True)['inconsistent'], 0)
+        # Rebuilt books are picked up by full rebuild of catalog indexes
+        version, full_version = CatalogVersion.get_versions()
+        self.assertEqual(full_version, version)
+        self.assertGreater(version, versions[0])
+
+
+class ThumbnailsTest(TransactionTestCase):
+    """
+    Thumbnails are cached by executor threads, which use their own connections
+    """
+    images = {
+        'http://images.example.com/a.jpg': b'image a',
+        # Another url of the same image
+        'http://images.example.com/copy-of-a.jpg': b'image a',
+        'http://images.example.com/broken.jpg': b'broken image',
+    }
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        # Thumbnails are cached by the tests, not in the background
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, BOOKS_THUMBNAILS=dict(settings.BOOKS_THUMBNAILS, ENABLED=False),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for name in ['download_thumbnail', 'process_image']:
+            patcher = mock.patch.object(thumbnails, name, side_effect=getattr(self, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.ingest([(1, 'a.jpg'), (2, 'a.jpg'), (3, 'copy-of-a.jpg'), (4, 'missing.jpg'), (5, 'broken.jpg')])
+
+    def ingest(self, thumbnails_by_number):
+        volumes = []
+        for number, name in thumbnails_by_number:
+            volume = get_volume(number, ['Ann Smith'], ['Fiction'], '1999')
+            volume['volumeInfo']['imageLinks']['thumbnail'] = f'http://images.example.com/{name}'
+            volumes.append(volume)
+        downloader = BookDownloader(books=volumes)
+        downloader.perform_create()
+        return downloader
+
+    def download_thumbnail(self, url):
+        if url not in self.images:
+            raise requests.HTTPError(f"404 Client Error for url: {url}")
+        return mock.Mock(content=self.images[url], headers={'Content-Type': 'image/jpeg'})
+
+    @staticmethod
+    def process_image(content, content_type):
+        if content == b'broken image':
+            raise OSError("cannot identify image file")
+        return content, 'jpg'
+
+    def get_thumbnails(self):
+        return {
+            book.book_id: BookReadSerializer(book).data['thumbnail']
+            for book in Book.objects.order_by('book_id')
+        }
+
+    def get_stored_files(self):
+        return [name for path, dirs, names in os.walk(self.media_root) for name in names]
+
+    def test_thumbnails_are_stored_once_and_failures_do_not_stop_others(self):
+        # Remote urls are served until thumbnails are cached
+        self.assertEqual(self.get_thumbnails()['book1'], 'http://images.example.com/a.jpg')
+
+        self.assertEqual(thumbnails.cache_missing_thumbnails(), 2)
+        served = self.get_thumbnails()
+        path = Book.objects.get(book_id='book1').thumbnail_path
+        self.assertEqual(served['book1'], f'/media/{path}')
+        self.assertEqual(served['book2'], served['book1'])
+        self.assertEqual(served['book3'], served['book1'])
+        self.assertEqual(served['book4'], 'http://images.example.com/missing.jpg')
+        self.assertEqual(served['book5'], 'http://images.example.com/broken.jpg')
+        self.assertEqual(self.get_stored_files(), [os.path.basename(path)])
+
+    def test_batch_bumps_catalog_version_once_and_keeps_modified_date(self):
+        modified_dates = dict(Book.objects.values_list('book_id', 'modified_date'))
+        version, full_version = CatalogVersion.get_versions()
+
+        thumbnails.cache_missing_thumbnails()
+        self.assertEqual(CatalogVersion.get_versions(), (version + 1, full_version))
+        # Caching is not a refresh, stale books are still refreshed in their turn
+        self.assertEqual(dict(Book.objects.values_list('book_id', 'modified_date')), modified_dates)
+        book = Book.objects.get(book_id='book1')
+        self.assertGreater(book.changed_date, book.modified_date)
+
+    def test_new_book_with_cached_thumbnail_uses_it_at_once(self):
+        thumbnails.cache_missing_thumbnails()
+        downloader = self.ingest([(6, 'a.jpg'), (7, 'missing.jpg')])
+        self.assertEqual(downloader.thumbnails_to_cache, {'http://images.example.com/missing.jpg'})
+        served = self.get_thumbnails()
+        self.assertEqual(served['book6'], served['book1'])
+        self.assertEqual(served['book7'], 'http://images.example.com/missing.jpg')
+
+
+class BookTopTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BookDownloader(books=[
+            get_volume(1, ['Ann Smith'], ['Fiction'], '1999', 4.5),
+            get_volume(2, ['Bob Brown'], ['Fiction', 'History'], '2005-03', 3.0),
+            get_volume(3, ['Ann Smith'], ['History'], '2005-01-02', 5.0),
+        ]).perform_create()
+
+    def get_top(self, query):
+        # Replicas of test settings do not see data of the test transaction
+        response = self.client.get(f'/books/top?{query}', HTTP_X_PIN_PRIMARY='1')
+        self.assertEqual(response.status_code, 200)
+        return [book['book_id'] for book in response.context['books']]
+
+    def test_filters_share_semantics_of_book_filter_set(self):
+        self.assertEqual(self.get_top(''), ['book3', 'book1', 'book2'])
+        self.assertEqual(self.get_top('n=2'), ['book3', 'book1'])
+        self.assertEqual(self.get_top('year=2005'), ['book3', 'book2'])
+        self.assertEqual(self.get_top('author=bob&author=ann'), ['book3', 'book1', 'book2'])
+        self.assertEqual(self.get_top('category=history&author=smith'), ['book3'])
+        self.assertEqual(self.get_top('category=fiction&category=history&year=1999'), ['book1'])
+        self.assertEqual(self.client.get('/books/top?year=abc', HTTP_X_PIN_PRIMARY='1').status_code, 400)
+
+
+@override_settings(RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=False))
+class SparseFieldsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BookDownloader(books=[
+            get_volume(1, ['Ann Smith'], ['Fiction'], '1999', 4.5),
+            get_volume(2, ['Bob Brown'], ['History'], '2005', 3.0),
+        ]).perform_create()
+
+    def get(self, path):
+        # Replicas of test settings do not see data of the test transaction
+        return self.client.get(path, HTTP_X_PIN_PRIMARY='1')
+
+    def get_books(self, path):
+        response = self.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.context['books'] if 'books' in response.context else [response.context['book']]
+
+    def test_unknown_fields_are_rejected(self):
+        for path in ['/books?fields=book_id,nope', '/books?exclude=nope', '/books/top?fields=nope',
+                     '/books/book1?exclude=title,nope']:
+            self.assertEqual(self.get(path).status_code, 400, path)
+
+    def test_only_requested_fields_are_serialized(self):
+        for path in ['/books', '/books/top', '/books/book1']:
+            books = self.get_books(f'{path}?fields=book_id,title')
+            self.assertEqual([set(book) for book in books], [{'book_id', 'title'}] * len(books), path)
+
+            books = self.get_books(f'{path}?exclude=authors&exclude=categories,thumbnail')
+            self.assertEqual(set(books[0]), {'book_id', 'title', 'published_date', 'average_rating', 'ratings_count'})
+
+    @override_settings(BOOKS_SERVE_READ_MODEL=False)
+    def test_only_needed_columns_and_relations_are_loaded(self):
+        def get_queries(path):
+            with CaptureQueriesContext(connection) as queries:
+                self.get_books(path)
+            return [query['sql'] for query in queries]
+
+        for path in ['/books', '/books/top', '/books/book1']:
+            queries = get_queries(f'{path}?fields=book_id,title')
+            book_queries = [sql for sql in queries if 'FROM "books_book"' in sql]
+            self.assertEqual(len(book_queries), 1, path)
+            columns = re.match(r'SELECT (.*?) FROM', book_queries[0]).group(1)
+            self.assertEqual(columns, '"books_book"."id", "books_book"."book_id", "books_book"."title"', path)
+            self.assertFalse([sql for sql in queries if 'books_author' in sql or 'books_category' in sql], path)
+
+            queries = get_queries(f'{path}?fields=book_id,authors')
+            self.assertEqual(len([sql for sql in queries if 'FROM "books_author"' in sql]), 1, path)
+            self.assertFalse([sql for sql in queries if 'books_category' in sql], path)
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica_0', 'replica_1'],
+    RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=False),
+)
+class BookReplicaReadsTest(TestCase):
+    """
+    Replicas of test settings are separate connections mirroring the test database
+    """
+    databases = {'default', 'replica_0', 'replica_1'}
+
+    def get_queries(self, path, **extra):
+        """
+        Return numbers of queries run on primary and on replicas by GET request
+        """
+        with CaptureQueriesContext(connection) as primary:
+            with CaptureQueriesContext(connections['replica_0']) as first:
+                with CaptureQueriesContext(connections['replica_1']) as second:
+                    self.assertEqual(self.client.get(path, **extra).status_code, 200)
+        return len(primary), len(first) + len(second)
+
+    def test_reads_go_to_replicas(self):
+        primary, replicas = self.get_queries('/books')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replicas, 0)
+
+    def test_pinned_client_reads_from_primary(self):
+        self.client.cookies[settings.DATABASE_PRIMARY_PIN_COOKIE] = '1'
+        primary, replicas = self.get_queries('/books')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replicas, 0)
+
+        self.client.cookies.clear()
+        self.assertEqual(self.get_queries('/books', HTTP_X_PIN_PRIMARY='1')[1], 0)
@@ -0,0 +1,199 @@
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, DatabaseError
+from django.utils import timezone
+
+from ..core.utils import TokenBucket
+from .models import Book, CatalogVersion
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Errors of one thumbnail, which must not stop the others
+CACHE_ERRORS = (requests.RequestException, OSError, ValueError, DatabaseError)
+if Image is not None:
+    CACHE_ERRORS += (Image.DecompressionBombError,)
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Images are not fetched through the Google Books API scheduler, so they do not use up its quota and rate
+_session = None
+_bucket = None
+_session_lock = threading.Lock()
+
+# Urls being fetched by this process
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Return executor which bounds number of concurrent thumbnail downloads of the process
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BOOKS_THUMBNAILS['CONCURRENCY'],
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def get_session():
+    """
+    Return session and rate limit of thumbnail downloads of the process
+    """
+    global _session, _bucket
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _bucket = TokenBucket(settings.BOOKS_THUMBNAILS['RATE'])
+        return _session, _bucket
+
+
+def download_thumbnail(url):
+    """
+    Return successful response of image host, raise requests.RequestException otherwise
+    """
+    session, bucket = get_session()
+    bucket.acquire()
+    response = session.get(url, timeout=settings.BOOKS_THUMBNAILS['TIMEOUT'])
+    response.raise_for_status()
+    return response
+
+
+def get_cached_thumbnails(urls):
+    """
+    Return paths of already cached thumbnails by url
+    """
+    return dict(
+        Book.objects.filter(thumbnail__in=urls)
+                    .exclude(thumbnail_path='')
+                    .values_list('thumbnail', 'thumbnail_path')
+    )
+
+
+def process_image(content, content_type):
+    """
+    Resize and re-encode image as JPEG if Pillow is installed and BOOKS_THUMBNAILS['MAX_SIZE'] is set.
+    Return content and its file extension.
+    """
+    max_size = settings.BOOKS_THUMBNAILS['MAX_SIZE']
+    if Image is None or not max_size:
+        return content, EXTENSIONS.get(content_type, 'jpg')
+
+    image = Image.open(io.BytesIO(content))
+    image.thumbnail(max_size)
+    output = io.BytesIO()
+    image.convert('RGB').save(output, 'JPEG', quality=settings.BOOKS_THUMBNAILS['QUALITY'], optimize=True)
+    return output.getvalue(), 'jpg'
+
+
+def store_thumbnail(content, content_type):
+    """
+    Store image under MEDIA_ROOT by hash of its content and return its path.
+    The same image shared by many books or urls is stored once.
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    content, extension = process_image(content, content_type)
+    path = f'thumbnails/{digest[:2]}/{digest}.{extension}'
+    if not default_storage.exists(path):
+        default_storage.save(path, ContentFile(content))
+    return path
+
+
+class ThumbnailBatch(object):
+    """
+    Thumbnails scheduled together. Catalog version is bumped once, after the last of them, if any books were updated,
+    so a batch drops cached responses and patches catalog indexes once.
+    """
+
+    def __init__(self, size):
+        self.pending = size
+        self.updated = 0
+        self._lock = threading.Lock()
+
+    def done(self, updated):
+        """
+        Count finished thumbnail and its updated books, return True if catalog version should be bumped
+        """
+        with self._lock:
+            self.pending -= 1
+            self.updated += updated
+            return not self.pending and self.updated > 0
+
+
+def cache_thumbnail(url, batch=None):
+    """
+    Download thumbnail and point all books using this url to the local copy
+    """
+    updated = 0
+    try:
+        response = download_thumbnail(url)
+        path = store_thumbnail(response.content, response.headers.get('Content-Type', '').split(';')[0])
+        # Cached thumbnail is not a refresh from the source, so modified_date is kept
+        updated = Book.objects.filter(thumbnail=url, thumbnail_path='').update(
+            thumbnail_path=path, changed_date=timezone.now(),
+        )
+        logger.info(f"Thumbnail {url} cached as {path} for {updated} books")
+        return path
+    except CACHE_ERRORS as err:
+        logger.error(f"Failed to cache thumbnail {url} - {err}")
+        return None
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(url)
+        try:
+            if batch.done(updated) if batch is not None else updated:
+                CatalogVersion.bump()
+        except DatabaseError as err:
+            logger.error(f"Failed to bump catalog version after caching thumbnails - {err}")
+        # Runs in executor thread
+        close_old_connections()
+
+
+def schedule_thumbnails(urls):
+    """
+    Cache thumbnails in the background, each url once.
+    Return list of futures of scheduled downloads.
+    """
+    with _in_flight_lock:
+        urls = set(urls) - _in_flight
+        _in_flight.update(urls)
+    executor = get_executor()
+    batch = ThumbnailBatch(len(urls))
+    return [executor.submit(cache_thumbnail, url, batch) for url in urls]
+
+
+def cache_missing_thumbnails():
+    """
+    Cache thumbnails of all books which still hot-link them and wait until done.
+    Return number of downloaded thumbnails.
+    """
+    urls = Book.objects.filter(thumbnail_path='').exclude(thumbnail='') \
+                       .values_list('thumbnail', flat=True).distinct()
+    futures = schedule_thumbnails(urls)
+    wait(futures)
+    return sum(1 for future in futures if future.result())
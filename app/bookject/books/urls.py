@@ -11,6 +11,13 @@ urlpatterns = [
         view=apiv1.BookListAPIView.as_view(),
         name='list',
     ),
+    # /books/top
+    # eg. /books/top?n=20&year=2006&category=Fiction
+    path(
+        route='books/top',
+        view=apiv1.BookTopAPIView.as_view(),
+        name='top',
+    ),
     # /books/:pk
     # eg. /books/ML6TpwAACAAJ
     path(
@@ -0,0 +1,83 @@
+import logging
+from functools import partial
+
+import psycopg2
+from psycopg2 import extensions
+from django.db.backends.postgresql import base
+
+from ...pool import ConnectionPool, get_pool
+from .creation import DatabaseCreation
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+
+def is_usable_connection(connection):
+    """
+    Health check of pooled connection run before it is reused
+    """
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend which takes connections from a per-process ConnectionPool
+    instead of opening a new one, and gives them back instead of closing.
+    Pool is configured with the POOL dictionary of database settings:
+    MAX_SIZE, IDLE_TIMEOUT, TIMEOUT (waiting for a free connection) and HEALTH_CHECKS.
+    """
+    creation_class = DatabaseCreation
+
+    def get_pool(self):
+        settings_dict = self.settings_dict
+        options = settings_dict.get('POOL') or {}
+
+        # Alias alone is not enough, the same alias connects to the 'postgres' or test database as well
+        key = (self.alias, settings_dict['NAME'], settings_dict['HOST'], settings_dict['PORT'], settings_dict['USER'])
+
+        return get_pool(key, lambda: ConnectionPool(
+            max_size=options.get('MAX_SIZE', 10),
+            idle_timeout=options.get('IDLE_TIMEOUT', 300),
+            timeout=options.get('TIMEOUT', 30),
+            health_check=is_usable_connection if options.get('HEALTH_CHECKS', True) else None,
+        ))
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool().get(partial(super().get_new_connection, conn_params))
+
+        # Wrapper of reused connection has not been set up by get_new_connection
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().put(self.connection, close=not self.reset_connection())
+
+    def reset_connection(self):
+        """
+        Prepare connection to be given back to the pool.
+        Return False if connection should be closed instead.
+        """
+        if self.connection.closed or self.errors_occurred:
+            return False
+        status = self.connection.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            self.connection.rollback()
+        except psycopg2.Error as err:
+            logger.warning(f"Failed to rollback connection before giving back to the pool - {err}")
+            return False
+        return True
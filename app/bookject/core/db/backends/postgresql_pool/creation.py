@@ -0,0 +1,14 @@
+from django.db import connections
+from django.db.backends.postgresql import creation
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def destroy_test_db(self, *args, **kwargs):
+        # Connections kept in pools, also of aliases mirroring the test database, would prevent dropping it
+        name = self.connection.settings_dict['NAME']
+        for connection in connections.all():
+            if connection.settings_dict['NAME'] == name and hasattr(connection, 'get_pool'):
+                connection.close()
+                connection.get_pool().close_all()
+        super().destroy_test_db(*args, **kwargs)
@@ -0,0 +1,246 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from ..exceptions import DatabasePoolExhausted
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# Pools of the current process, keyed by (pid, key)
+_pools = {}
+
+# Pools inherited from a parent process, kept so garbage collection does not close the parent's connections
+_inherited_pools = []
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool(object):
+    """
+    Thread-safe pool of persistent DB-API connections.
+    Connections are opened lazily up to `max_size`. A connection given back
+    with `put()` is kept open and handed out again by `get()` after passing
+    the `health_check` callable. Connections idle for more than
+    `idle_timeout` seconds are closed. When the pool is exhausted `get()`
+    waits up to `timeout` seconds for a free connection and then raises
+    DatabasePoolExhausted.
+    """
+
+    def __init__(self, max_size=10, idle_timeout=300, timeout=30, health_check=None):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.health_check = health_check
+
+        # Idle connections as (connection, returned_at) pairs, most recently returned on the right
+        self._idle = deque()
+
+        # Number of open connections, both idle and in use
+        self._size = 0
+
+        self._condition = threading.Condition()
+
+        # Threads waiting for a connection, in order of arrival
+        self._waiters = deque()
+
+        # Pool metrics
+        self.in_use = 0
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def get(self, connect):
+        """
+        Return a healthy connection from the pool.
+        `connect` is called without arguments to open a new connection when
+        no idle connection is available and the pool is not full.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection = self._checkout(deadline)
+            if connection is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+                with self._condition:
+                    self.created += 1
+                return connection
+
+            if self.health_check is None or self.health_check(connection):
+                with self._condition:
+                    self.reused += 1
+                return connection
+
+            logger.warning("Discarding pooled connection which failed health check")
+            self._close(connection)
+            self._release_slot()
+
+    def put(self, connection, close=False):
+        """
+        Give the connection back to the pool, or close it if `close` is set.
+        """
+        if close:
+            self._close(connection)
+            self._release_slot()
+            return
+
+        with self._condition:
+            if self._waiters:
+                # Hand over directly, so threads waiting longer are not overtaken
+                self._waiters.popleft().append(connection)
+                self._condition.notify_all()
+            else:
+                self.in_use -= 1
+                self._idle.append((connection, time.monotonic()))
+
+    def get_stats(self):
+        """
+        Return a snapshot of pool metrics
+        """
+        with self._condition:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'waiting': len(self._waiters),
+                'in_use': self.in_use,
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded,
+                'waits': self.waits,
+                'wait_time': round(self.wait_time, 6),
+            }
+
+    def close_all(self):
+        """
+        Close all idle connections. Connections in use are closed when returned.
+        """
+        with self._condition:
+            idle = [connection for connection, returned_at in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._wake_waiters()
+        for connection in idle:
+            self._close(connection)
+
+    def _checkout(self, deadline):
+        """
+        Take an idle connection or reserve a slot for a new one.
+        Return the idle connection, or None if a slot has been reserved.
+        """
+        expired = []
+        waiter, waited_since = None, None
+        try:
+            with self._condition:
+                expired += self._pop_expired()
+                self._wake_waiters()
+                if self._idle and not self._waiters:
+                    connection, returned_at = self._idle.pop()
+                    self.in_use += 1
+                    return connection
+                if self._size < self.max_size:
+                    self._size += 1
+                    self.in_use += 1
+                    return None
+
+                # Wait in line for a connection (or a free slot, passed as None) from put()/_release_slot()
+                waiter, waited_since = [], time.monotonic()
+                self._waiters.append(waiter)
+                self.waits += 1
+                while not waiter:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._waiters.remove(waiter)
+                        logger.error(f"Connection pool exhausted after waiting {self.timeout}s")
+                        raise DatabasePoolExhausted
+                    self._condition.wait(remaining)
+                return waiter[0]
+        finally:
+            if waited_since is not None:
+                with self._condition:
+                    self.wait_time += time.monotonic() - waited_since
+            for connection in expired:
+                self._close(connection)
+
+    def _pop_expired(self):
+        """
+        Remove connections idle for longer than idle_timeout. Caller must hold the lock.
+        """
+        expired = []
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            connection, returned_at = self._idle.popleft()
+            expired.append(connection)
+            self._size -= 1
+        return expired
+
+    def _wake_waiters(self):
+        """
+        Pass free slots to waiting threads. Caller must hold the lock.
+        """
+        while self._waiters and self._size < self.max_size:
+            self._size += 1
+            self.in_use += 1
+            self._waiters.popleft().append(None)
+            self._condition.notify_all()
+
+    def _release_slot(self):
+        with self._condition:
+            self.discarded += 1
+            if self._waiters:
+                # Pass the slot on, first waiting thread opens a new connection
+                self._waiters.popleft().append(None)
+                self._condition.notify_all()
+            else:
+                self._size -= 1
+                self.in_use -= 1
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception as err:
+            logger.warning(f"Failed to close pooled connection - {err}")
+
+
+def get_pool(key, factory):
+    """
+    Return the pool registered under `key` for the current process, creating it with `factory` if needed.
+    Pools inherited from a parent process are set aside, never used and never closed: closing their connections,
+    also when psycopg2 finalizes them, would terminate the parent's connections over the shared socket.
+    """
+    pid = os.getpid()
+    with _pools_lock:
+        for pool_key in [pool_key for pool_key in _pools if pool_key[0] != pid]:
+            _inherited_pools.append(_pools.pop(pool_key))
+        pool = _pools.get((pid, key))
+        if pool is None:
+            pool = _pools[(pid, key)] = factory()
+        return pool
+
+
+def get_pools_stats():
+    """
+    Return metrics of all pools of the current process
+    """
+    pid = os.getpid()
+    with _pools_lock:
+        pools = {key: pool for (pool_pid, key), pool in _pools.items() if pool_pid == pid}
+    return {key: pool.get_stats() for key, pool in pools.items()}
+
+
+def close_all_pools():
+    """
+    Close idle connections of all pools of the current process, eg. before forking workers
+    """
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [pool for (pool_pid, key), pool in _pools.items() if pool_pid == pid]
+    for pool in pools:
+        pool.close_all()
@@ -0,0 +1,132 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections, DatabaseError
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# Reads are sent to replicas only within replica_reads() block, to the one replica chosen for the block
+_replica_reads = ContextVar('replica_reads', default=None)
+
+# Replication lag check results by alias - (checked_at, healthy)
+_replica_status = {}
+_replica_status_lock = threading.Lock()
+
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Send reads within the block to replicas. Replica is chosen on the first read and used for all reads
+    of the block, so they see the same replication lag.
+    """
+    token = _replica_reads.set({} if enabled else None)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def get_replica_lag(alias):
+    """
+    Return replication lag of replica in seconds
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute(REPLICA_LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def is_replica_healthy(alias):
+    """
+    Return False if replica is unreachable or falls behind more than DATABASE_REPLICA_MAX_LAG seconds.
+    Result is kept for DATABASE_REPLICA_CHECK_INTERVAL seconds.
+    """
+    now = time.monotonic()
+    checked_at, healthy = _replica_status.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < settings.DATABASE_REPLICA_CHECK_INTERVAL:
+        return healthy
+
+    with _replica_status_lock:
+        # Result of other thread checking the same replica in the meantime
+        checked_at, healthy = _replica_status.get(alias, (None, False))
+        if checked_at is not None and now - checked_at < settings.DATABASE_REPLICA_CHECK_INTERVAL:
+            return healthy
+        try:
+            lag = get_replica_lag(alias)
+            healthy = lag <= settings.DATABASE_REPLICA_MAX_LAG
+            if not healthy:
+                logger.warning(f"Replica {alias} is {lag:.1f}s behind, taken out of rotation")
+        except DatabaseError as err:
+            logger.error(f"Replica {alias} is unreachable, taken out of rotation - {err}")
+            healthy = False
+        _replica_status[alias] = (time.monotonic(), healthy)
+    return healthy
+
+
+def get_replica():
+    """
+    Return alias of random healthy replica or None if there is none
+    """
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if is_replica_healthy(alias)]
+    return random.choice(replicas) if replicas else None
+
+
+def is_pinned_to_primary(request):
+    """
+    Return True if client asked to read from primary, eg. because it has just written to it
+    """
+    return bool(
+        request.COOKIES.get(settings.DATABASE_PRIMARY_PIN_COOKIE)
+        or request.META.get(settings.DATABASE_PRIMARY_PIN_HEADER)
+    )
+
+
+def pin_to_primary(response):
+    """
+    Pin reads of the client to primary for DATABASE_PRIMARY_PIN_SECONDS
+    """
+    response.set_cookie(
+        settings.DATABASE_PRIMARY_PIN_COOKIE, '1',
+        max_age=settings.DATABASE_PRIMARY_PIN_SECONDS,
+        httponly=True,
+    )
+    return response
+
+
+class ReplicaRouter(object):
+    """
+    Send reads within replica_reads() block to the healthy replica chosen for the block,
+    everything else to primary (default).
+    """
+
+    def db_for_read(self, model, **hints):
+        block = _replica_reads.get()
+        if block is None:
+            return None
+        if 'alias' not in block:
+            block['alias'] = get_replica()
+        return block['alias']
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,62 @@
+from django.db import connections
+
+UPSERT_SQL = """
+    INSERT INTO {table} ({columns}) VALUES {values}
+    ON CONFLICT ({unique}) DO {action}
+    RETURNING {pk}, {unique}, (xmax = 0)
+"""
+
+
+def bulk_upsert(objs, unique_field, update_fields=(), using='default'):
+    """
+    Insert objects of one model with a single INSERT ... ON CONFLICT statement.
+    On conflict of `unique_field`, `update_fields` of existing row are updated, or nothing is done if there are none.
+    Rows are written in order of `unique_field`, so concurrent upserts lock them in the same order.
+    Return list of (pk, unique value, inserted) of inserted and updated rows.
+    """
+    if not objs:
+        return []
+    model = type(objs[0])
+    opts = model._meta
+    connection = connections[using]
+    quote = connection.ops.quote_name
+
+    fields = [field for field in opts.concrete_fields if not field.primary_key]
+    unique = opts.get_field(unique_field)
+    objs = sorted(objs, key=lambda obj: getattr(obj, unique.attname))
+
+    params = []
+    for obj in objs:
+        params += [field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields]
+    row = '(' + ', '.join(['%s'] * len(fields)) + ')'
+
+    if update_fields:
+        columns = [opts.get_field(name).column for name in update_fields]
+        action = 'UPDATE SET ' + ', '.join(f'{quote(column)} = EXCLUDED.{quote(column)}' for column in columns)
+    else:
+        action = 'NOTHING'
+
+    sql = UPSERT_SQL.format(
+        table=quote(opts.db_table),
+        columns=', '.join(quote(field.column) for field in fields),
+        values=', '.join([row] * len(objs)),
+        unique=quote(unique.column),
+        action=action,
+        pk=quote(opts.pk.column),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def bulk_get_or_create(model, field_name, values, using='default'):
+    """
+    Create missing objects by value of unique field, concurrent creation of the same value is not an error.
+    Return dictionary of objects by the value.
+    """
+    values = set(values)
+    bulk_upsert([model(**{field_name: value}) for value in values], field_name, using=using)
+    return {
+        getattr(obj, field_name): obj
+        for obj in model.objects.using(using).filter(**{f'{field_name}__in': values})
+    }
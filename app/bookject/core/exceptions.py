@@ -12,3 +12,15 @@ class ResponseDeserializationError(APIException):
     """Raised when response deserialization has failed"""
     status_code = status.HTTP_400_BAD_REQUEST
     default_detail = 'Response deserialization has failed.'
+
+
+class DatabasePoolExhausted(APIException):
+    """Raised when no database connection has been released in time"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Database connection pool exhausted.'
+
+
+class UpstreamQuotaExceeded(APIException):
+    """Raised when daily quota of upstream requests has been used up"""
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    default_detail = 'Upstream request quota exceeded, try again tomorrow.'
@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from django.urls import resolve
+
+from ...utils.benchmark import measure, summarize, format_summary
+from ...utils.compression import COMPRESSORS, compress, get_compression_stats
+
+
+class Command(BaseCommand):
+    help = "Measure CPU cost and bytes saved by compression of a response, and latency of precompressed responses"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/books', help="Path with query string of benchmarked response")
+        parser.add_argument('--requests', type=int, default=200, help="Number of simulated requests")
+
+    def get_response(self, path, encoding=None):
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=encoding or 'identity')
+        response = resolve(request.path_info).func(request)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code != 200:
+            raise CommandError(f"{path} returned {response.status_code}")
+        return response
+
+    def handle(self, *args, **options):
+        path = options['path']
+        content = self.get_response(path).content
+        self.stdout.write(f"{path}: {len(content)} bytes")
+
+        for encoding in COMPRESSORS:
+            start = time.thread_time()
+            compressed = compress(content, encoding)
+            cpu_ms = (time.thread_time() - start) * 1000
+            self.stdout.write(
+                f"  {encoding}: {len(compressed)} bytes ({len(compressed) / len(content):.1%}), "
+                f"saved {len(content) - len(compressed)} bytes, cpu {cpu_ms:.2f}ms"
+            )
+
+        with override_settings(RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=False)):
+            latencies, elapsed = measure(lambda: self.get_response(path), options['requests'])
+        self.stdout.write(format_summary('uncached', summarize(latencies, elapsed)))
+
+        # The first request renders and compresses the response, the rest are served from cache
+        for encoding in COMPRESSORS:
+            latencies, elapsed = measure(lambda: self.get_response(path, encoding), options['requests'])
+            self.stdout.write(format_summary(f'precompressed {encoding}', summarize(latencies, elapsed)))
+
+        self.stdout.write(f"stats: {get_compression_stats()}")
@@ -0,0 +1,55 @@
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ...db.backends.postgresql_pool.base import is_usable_connection
+from ...db.pool import ConnectionPool
+from ...utils.benchmark import measure, summarize, format_summary
+
+
+class Command(BaseCommand):
+    help = "Compare latency of queries run on fresh and pooled database connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias to benchmark")
+        parser.add_argument('--requests', type=int, default=1000, help="Number of simulated requests")
+        parser.add_argument('--concurrency', type=int, default=16, help="Number of concurrent clients")
+        parser.add_argument('--pool-size', type=int, default=10, help="Max size of benchmarked pool")
+        parser.add_argument('--sql', default='SELECT 1', help="Query run by each simulated request")
+
+    def handle(self, *args, **options):
+        wrapper = connections[options['database']]
+        conn_params = wrapper.get_connection_params()
+
+        # Bypass the configured backend, so both runs open connections the same way
+        connect = partial(wrapper.Database.connect, **conn_params)
+
+        def query(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(options['sql'])
+                cursor.fetchall()
+            connection.rollback()
+
+        def fresh_connection_request():
+            connection = connect()
+            try:
+                query(connection)
+            finally:
+                connection.close()
+
+        pool = ConnectionPool(max_size=options['pool_size'], health_check=is_usable_connection)
+
+        def pooled_connection_request():
+            connection = pool.get(connect)
+            try:
+                query(connection)
+            finally:
+                pool.put(connection)
+
+        for name, request in [('fresh', fresh_connection_request), ('pooled', pooled_connection_request)]:
+            latencies, elapsed = measure(request, options['requests'], options['concurrency'])
+            self.stdout.write(format_summary(name, summarize(latencies, elapsed)))
+
+        self.stdout.write(f"pool: {pool.get_stats()}")
+        pool.close_all()
@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter, so nothing is imported yet. Prints durations of startup phases in seconds as json.
+STARTUP_SCRIPT = """
+import importlib, json, os, time
+start = time.perf_counter()
+import django
+phases = {'django': time.perf_counter() - start}
+
+mark = time.perf_counter()
+importlib.import_module(os.environ['DJANGO_SETTINGS_MODULE'])
+phases['settings'] = time.perf_counter() - mark
+
+mark = time.perf_counter()
+django.setup(set_prefix=False)
+phases['apps'] = time.perf_counter() - mark
+
+mark = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+phases['wsgi'] = time.perf_counter() - mark
+
+mark = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+phases['urls'] = time.perf_counter() - mark
+
+phases['total'] = time.perf_counter() - start
+print(json.dumps(phases))
+"""
+
+
+def parse_import_times(output):
+    """
+    Return list of (module, self_us, cumulative_us) from output of python -X importtime
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        try:
+            modules.append((module.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            # Header line
+            continue
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Report import time of modules and settings/app registry setup time of a fresh process"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help="Number of slowest modules to report")
+        parser.add_argument('--budget', type=float, help="Fail if total startup takes longer (milliseconds)")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            env=env, capture_output=True, text=True,
+        )
+        if process.returncode:
+            raise CommandError(f"Startup failed:\n{process.stderr[-2000:]}")
+
+        phases = {phase: round(seconds * 1000, 1) for phase, seconds in json.loads(process.stdout).items()}
+        self.stdout.write("Startup phases (ms): " + ' '.join(f'{phase}={ms}' for phase, ms in phases.items()))
+
+        modules = parse_import_times(process.stderr)
+        self.stdout.write(f"Imported modules: {len(modules)}, slowest by self time (ms):")
+        for module, self_us, cumulative_us in sorted(modules, key=lambda item: item[1], reverse=True)[:options['top']]:
+            self.stdout.write(f"  {self_us / 1000:8.1f} {cumulative_us / 1000:8.1f}  {module}")
+
+        if options['budget'] is not None and phases['total'] > options['budget']:
+            raise CommandError(f"Startup took {phases['total']}ms, budget is {options['budget']}ms")
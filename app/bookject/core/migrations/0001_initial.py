@@ -0,0 +1,31 @@
+# Generated by Django 3.1.3 on 2026-10-19 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimit',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('tokens', models.FloatField()),
+                ('rate_factor', models.FloatField(default=1)),
+                ('updated_date', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UsageCounter',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+                ('expires_date', models.DateTimeField()),
+            ],
+        ),
+    ]
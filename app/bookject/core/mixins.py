@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .db.routers import replica_reads, is_pinned_to_primary
+from .utils.compression import get_accepted_encoding, compress, count_served
+
+
+class ReplicaReadMixin(object):
+    """
+    Serve requests with reads from replicas, unless client is pinned to primary
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(not is_pinned_to_primary(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+
+class PrecompressedResponseMixin(object):
+    """
+    Cache rendered GET responses by url and get_cache_version(), together with their compressed bodies,
+    so repeated requests are served precompressed without rendering and compressing again.
+    Enabled on views with `precompress = True`, see RESPONSE_CACHE setting.
+    """
+    precompress = False
+
+    def get_cache_version(self):
+        """
+        Return version of data the response is rendered from, changed version invalidates cached responses
+        """
+        raise NotImplementedError
+
+    def get_response_cache_key(self, request, version, encoding):
+        return f"response:{version}:{encoding or 'identity'}:{request.get_full_path()}"
+
+    def get_response_content(self, request, version, *args, **kwargs):
+        """
+        Return content type and content of rendered response from cache, or render and cache it.
+        Return response itself if it should not be cached.
+        """
+        key = self.get_response_cache_key(request, version, None)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code != 200 or response.has_header('Set-Cookie'):
+            return response
+
+        cached = response['Content-Type'], response.content
+        cache.set(key, cached, settings.RESPONSE_CACHE['TIMEOUT'])
+        return cached
+
+    def dispatch(self, request, *args, **kwargs):
+        options = settings.RESPONSE_CACHE
+        if (
+            not self.precompress
+            or not options['ENABLED']
+            or request.method != 'GET'
+            # Client has just written data, which cached response may not have yet
+            or is_pinned_to_primary(request)
+        ):
+            return super().dispatch(request, *args, **kwargs)
+
+        # Read once, so compressed body is cached under the version of the body it was compressed from
+        version = self.get_cache_version()
+        cached = self.get_response_content(request, version, *args, **kwargs)
+        if isinstance(cached, HttpResponse):
+            return cached
+        content_type, content = cached
+
+        encoding = get_accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), options['ENCODINGS'])
+        if encoding and len(content) >= options['MIN_SIZE']:
+            key = self.get_response_cache_key(request, version, encoding)
+            compressed = cache.get(key)
+            if compressed is None:
+                compressed = compress(content, encoding)
+                cache.set(key, compressed, options['TIMEOUT'])
+            count_served(encoding, len(content), len(compressed))
+            response = HttpResponse(compressed, content_type=content_type)
+            response['Content-Encoding'] = encoding
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
@@ -0,0 +1,116 @@
+from django.db import models, connection
+from django.db.models import F
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+TAKE_TOKEN_SQL = """
+    WITH bucket AS (
+        SELECT name, rate_factor, now,
+               LEAST(%(capacity)s, tokens + EXTRACT(EPOCH FROM now - updated_date) * %(rate)s * rate_factor) AS tokens
+        FROM {table}, clock_timestamp() AS now
+        WHERE name = %(name)s
+        FOR UPDATE OF {table}
+    )
+    UPDATE {table} SET
+        tokens = bucket.tokens - (%(minimum)s IS NULL OR bucket.tokens >= %(minimum)s)::int,
+        updated_date = bucket.now
+    FROM bucket
+    WHERE {table}.name = bucket.name
+    RETURNING {table}.tokens, {table}.rate_factor, (%(minimum)s IS NULL OR bucket.tokens >= %(minimum)s)
+"""
+
+INCREMENT_SQL = """
+    INSERT INTO {table} (key, count, expires_date) VALUES (%s, %s, %s)
+    ON CONFLICT (key) DO UPDATE SET count = {table}.count + EXCLUDED.count
+    RETURNING count
+"""
+
+
+class RateLimit(models.Model):
+    """
+    Token bucket shared by all processes, see bookject.core.utils.scheduler.SharedTokenBucket.
+    Statements lock the row only for their own duration when run outside of a transaction.
+    """
+    name = models.CharField(
+        max_length=100,
+        primary_key=True,
+    )
+    tokens = models.FloatField()
+    # Multiplier of the configured rate, decreased when upstream throttles requests
+    rate_factor = models.FloatField(
+        default=1,
+    )
+    updated_date = models.DateTimeField()
+
+    @classmethod
+    def take(cls, name, rate, capacity, minimum=None):
+        """
+        Refill the bucket and take one token if at least `minimum` tokens are available, or always if None.
+        Token taken from an empty bucket is borrowed from the future, tokens are then negative.
+        Return (tokens left, rate factor, whether the token was taken).
+        """
+        sql = TAKE_TOKEN_SQL.format(table=connection.ops.quote_name(cls._meta.db_table))
+        params = {'name': name, 'rate': rate, 'capacity': capacity, 'minimum': minimum}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+            if row is None:
+                # First use of the bucket, it starts full
+                cls.objects.get_or_create(name=name, defaults={'tokens': capacity, 'updated_date': timezone.now()})
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+            return row
+
+    @classmethod
+    def decrease_rate(cls, name, factor, minimum):
+        """
+        Multiply rate by `factor`, not below `minimum`, and drop the burst allowance
+        """
+        cls.objects.filter(name=name).update(
+            rate_factor=Greatest(F('rate_factor') * factor, minimum),
+            tokens=Least(F('tokens'), 0),
+        )
+
+    @classmethod
+    def increase_rate(cls, name, step):
+        """
+        Add `step` to rate factor, up to the configured rate
+        """
+        cls.objects.filter(name=name, rate_factor__lt=1).update(
+            rate_factor=Least(F('rate_factor') + step, 1),
+        )
+
+
+class UsageCounter(models.Model):
+    """
+    Counter shared by all processes, eg. of upstream requests per day.
+    Keys contain their period, counters are deleted once expired.
+    """
+    key = models.CharField(
+        max_length=100,
+        primary_key=True,
+    )
+    count = models.IntegerField(
+        default=0,
+    )
+    expires_date = models.DateTimeField()
+
+    @classmethod
+    def increment(cls, key, count, expires_date):
+        """
+        Add `count` to the counter atomically and return its new value
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                INCREMENT_SQL.format(table=connection.ops.quote_name(cls._meta.db_table)),
+                [key, count, expires_date],
+            )
+            value = cursor.fetchone()[0]
+        if value == count:
+            # First use of the key, counters of past periods are not needed any more
+            cls.objects.filter(expires_date__lt=timezone.now()).delete()
+        return value
+
+    @classmethod
+    def get_count(cls, key):
+        return cls.objects.filter(key=key).values_list('count', flat=True).first() or 0
@@ -1,3 +1,496 @@
-from django.test import TestCase
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, connections, DatabaseError
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.views import View
+
+from .db import routers
+from .db import pool as pool_module
+from .db.pool import ConnectionPool, get_pool, close_all_pools
+from .db.routers import replica_reads, pin_to_primary
+from .mixins import PrecompressedResponseMixin
+from .exceptions import DatabasePoolExhausted, UpstreamQuotaExceeded, GetResponseError
+from .models import RateLimit, UsageCounter
+from .utils import FetchScheduler, SharedSingleFlight, get_response, set_scheduler, get_scheduler, BULK
+
+
+class FakeConnection(object):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def get_in_thread(self, pool, results):
+        thread = threading.Thread(target=lambda: results.append(pool.get(FakeConnection)))
+        thread.start()
+        return thread
+
+    def wait_for_waiters(self, pool, count):
+        deadline = time.monotonic() + 5
+        while pool.get_stats()['waiting'] < count:
+            self.assertLess(time.monotonic(), deadline, "Threads did not start waiting")
+            time.sleep(0.001)
+
+    def test_reuses_connection(self):
+        pool = ConnectionPool(max_size=2)
+        connection = pool.get(FakeConnection)
+        pool.put(connection)
+        self.assertIs(pool.get(FakeConnection), connection)
+        stats = pool.get_stats()
+        self.assertEqual((stats['created'], stats['reused'], stats['size'], stats['in_use']), (1, 1, 1, 1))
+
+    def test_hands_off_connection_to_waiters_in_order(self):
+        pool = ConnectionPool(max_size=1, timeout=5)
+        connection = pool.get(FakeConnection)
+        results = []
+        first = self.get_in_thread(pool, results)
+        self.wait_for_waiters(pool, 1)
+        second = self.get_in_thread(pool, results)
+        self.wait_for_waiters(pool, 2)
+
+        pool.put(connection)
+        first.join(5)
+        self.assertEqual(results, [connection])
+        pool.put(results[0])
+        second.join(5)
+        self.assertEqual(results, [connection, connection])
+
+        stats = pool.get_stats()
+        self.assertEqual((stats['created'], stats['size'], stats['waits'], stats['waiting']), (1, 1, 2, 0))
+
+    def test_closed_connection_passes_slot_to_waiter(self):
+        pool = ConnectionPool(max_size=1, timeout=5)
+        connection = pool.get(FakeConnection)
+        results = []
+        thread = self.get_in_thread(pool, results)
+        self.wait_for_waiters(pool, 1)
+
+        pool.put(connection, close=True)
+        thread.join(5)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(results[0], connection)
+        self.assertEqual(pool.get_stats()['size'], 1)
+
+    def test_raises_when_exhausted(self):
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+        pool.get(FakeConnection)
+        with self.assertRaises(DatabasePoolExhausted):
+            pool.get(FakeConnection)
+        stats = pool.get_stats()
+        self.assertEqual((stats['waiting'], stats['in_use']), (0, 1))
+
+    def test_closes_idle_connections(self):
+        pool = ConnectionPool(max_size=2, idle_timeout=0.01)
+        connection = pool.get(FakeConnection)
+        pool.put(connection)
+        time.sleep(0.02)
+        new_connection = pool.get(FakeConnection)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(new_connection, connection)
+        self.assertEqual(pool.get_stats()['size'], 1)
+
+    def test_discards_connection_failing_health_check(self):
+        pool = ConnectionPool(max_size=1, health_check=lambda connection: not connection.closed)
+        connection = pool.get(FakeConnection)
+        pool.put(connection)
+        connection.closed = True
+        new_connection = pool.get(FakeConnection)
+        self.assertIsNot(new_connection, connection)
+        stats = pool.get_stats()
+        self.assertEqual((stats['discarded'], stats['size'], stats['created']), (1, 1, 2))
+
+    def test_failed_connect_frees_slot(self):
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+
+        def connect():
+            raise OSError
+
+        with self.assertRaises(OSError):
+            pool.get(connect)
+        self.assertIsInstance(pool.get(FakeConnection), FakeConnection)
+
+
+class PoolRegistryTest(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.multiple(pool_module, _pools={}, _inherited_pools=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pools_inherited_from_parent_are_kept_open(self):
+        with mock.patch('os.getpid', return_value=1):
+            parent_pool = get_pool('default', ConnectionPool)
+            connection = parent_pool.get(FakeConnection)
+            parent_pool.put(connection)
+        with mock.patch('os.getpid', return_value=2):
+            child_pool = get_pool('default', ConnectionPool)
+            close_all_pools()
+
+        self.assertIsNot(child_pool, parent_pool)
+        self.assertEqual(pool_module._inherited_pools, [parent_pool])
+        self.assertFalse(connection.closed)
+
+    def test_close_all_pools_closes_idle_connections(self):
+        pool = get_pool('default', ConnectionPool)
+        connection = pool.get(FakeConnection)
+        pool.put(connection)
+        close_all_pools()
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.get_stats()['size'], 0)
+
+
+class FakeUpstream(object):
+    """
+    HTTP server answering GET requests with queued status codes, 200 once the queue is empty
+    """
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.requests = []
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                upstream.requests.append(self.path)
+                status = upstream.statuses.pop(0) if upstream.statuses else 200
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', '0')
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FetchSchedulerTest(TestCase):
+
+    def setUp(self):
+        self.upstream = FakeUpstream()
+        self.addCleanup(self.upstream.close)
+
+    def get_scheduler(self, **kwargs):
+        options = dict(rate=20, burst=1, daily_quota=0, retries=3, backoff_base=0.01, backoff_cap=0.1)
+        options.update(kwargs)
+        return FetchScheduler(**options)
+
+    def test_retries_throttled_requests_and_slows_down_all_processes(self):
+        self.upstream.statuses = [429, 503]
+        scheduler = self.get_scheduler()
+        response = scheduler.fetch(self.upstream.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.upstream.requests), 3)
+
+        # Two throttled responses halved the shared rate, the successful one raised it a bit
+        self.assertAlmostEqual(RateLimit.objects.get(name='upstream').rate_factor, 0.3)
+        self.assertLess(scheduler.limiter.limit, 4)
+
+    def test_returns_last_response_when_retries_run_out(self):
+        self.upstream.statuses = [429] * 3
+        response = self.get_scheduler(retries=2).fetch(self.upstream.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(self.upstream.requests), 3)
+
+    def test_rate_limit_is_shared_by_processes(self):
+        # Schedulers of two processes share the bucket of 20 requests per second
+        schedulers = [self.get_scheduler(), self.get_scheduler()]
+        start = time.monotonic()
+        for index in range(10):
+            schedulers[index % 2].fetch(self.upstream.url)
+        self.assertGreaterEqual(time.monotonic() - start, 9 / 20)
+
+    def test_bulk_requests_leave_reserve_to_interactive_ones(self):
+        scheduler = self.get_scheduler(rate=10, burst=4)
+        start = time.monotonic()
+        scheduler.fetch(self.upstream.url, priority=BULK)
+        scheduler.fetch(self.upstream.url, priority=BULK)
+        # Third bulk request would dip into the reserve of 2 tokens and waits for a refill
+        scheduler.fetch(self.upstream.url, priority=BULK)
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+        # Interactive requests may use the reserve
+        start = time.monotonic()
+        scheduler.fetch(self.upstream.url)
+        scheduler.fetch(self.upstream.url)
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_bulk_requests_get_tokens_of_bucket_smaller_than_reserve(self):
+        # Default reserve of half the burst of 1 token would never be left otherwise
+        scheduler = self.get_scheduler(rate=20, burst=1)
+        start = time.monotonic()
+        for index in range(3):
+            scheduler.fetch(self.upstream.url, priority=BULK)
+        self.assertEqual(len(self.upstream.requests), 3)
+        self.assertGreaterEqual(time.monotonic() - start, 2 / 20)
+
+    def test_daily_quota_is_shared_by_processes(self):
+        first, second = self.get_scheduler(daily_quota=3), self.get_scheduler(daily_quota=3)
+        first.fetch(self.upstream.url)
+        first.fetch(self.upstream.url)
+        second.fetch(self.upstream.url)
+        with self.assertRaises(UpstreamQuotaExceeded):
+            second.fetch(self.upstream.url)
+        self.assertEqual(len(self.upstream.requests), 3)
+        self.assertEqual(first.quota.get_remaining(), 0)
+
+    def test_get_response_uses_shared_scheduler(self):
+        previous = get_scheduler()
+        self.addCleanup(set_scheduler, previous)
+        set_scheduler(self.get_scheduler(retries=0))
+
+        self.assertEqual(get_response(self.upstream.url).status_code, 200)
+        self.upstream.statuses = [500]
+        with self.assertRaises(GetResponseError):
+            get_response(self.upstream.url)
+
+
+class SharedSingleFlightTest(TransactionTestCase):
+    """
+    Callers of each thread use their own database connection, like callers of separate processes
+    """
+
+    def setUp(self):
+        self.leader_started, self.leader_finish = threading.Event(), threading.Event()
+        self.calls = []
+
+    def leader(self):
+        self.calls.append('leader')
+        self.leader_started.set()
+        self.assertTrue(self.leader_finish.wait(5))
+
+    def run_in_thread(self, flight, func, errors):
+        def target():
+            try:
+                flight.do('hobbit', func)
+            except Exception as err:
+                errors.append(err)
+            finally:
+                connections.close_all()
+        thread = threading.Thread(target=target)
+        thread.start()
+        return thread
+
+    def start_follower(self, follower_flight, errors):
+        thread = self.run_in_thread(follower_flight, lambda: self.calls.append('follower'), errors)
+        deadline = time.monotonic() + 5
+        while not follower_flight.coalesced:
+            self.assertLess(time.monotonic(), deadline, "Follower did not start waiting")
+            time.sleep(0.001)
+        return thread
+
+    def test_followers_wait_for_leader_and_share_its_success(self):
+        errors = []
+        leader = self.run_in_thread(SharedSingleFlight('test'), self.leader, errors)
+        self.assertTrue(self.leader_started.wait(5))
+        follower = self.start_follower(SharedSingleFlight('test'), errors)
+
+        self.leader_finish.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual((self.calls, errors), (['leader'], []))
+
+        # Calls after the leader finished run again
+        SharedSingleFlight('test').do('hobbit', self.calls.append, 'later')
+        self.assertEqual(self.calls, ['leader', 'later'])
+
+    def test_follower_runs_function_when_leader_failed(self):
+        errors = []
+
+        def failing_leader():
+            self.leader()
+            raise ValueError
+
+        leader = self.run_in_thread(SharedSingleFlight('test'), failing_leader, errors)
+        self.assertTrue(self.leader_started.wait(5))
+        follower = self.start_follower(SharedSingleFlight('test'), errors)
+
+        self.leader_finish.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual(self.calls, ['leader', 'follower'])
+        self.assertEqual([type(err) for err in errors], [ValueError])
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0', 'replica_1'], DATABASE_REPLICA_MAX_LAG=10)
+class ReplicaRouterTest(TestCase):
+    """
+    Replicas of test settings are separate connections mirroring the test database
+    """
+    databases = {'default', 'replica_0', 'replica_1'}
+
+    def setUp(self):
+        self.lags = {'replica_0': 0, 'replica_1': 0}
+        patcher = mock.patch.object(routers, 'get_replica_lag', side_effect=self.get_replica_lag)
+        self.get_lag = patcher.start()
+        self.addCleanup(patcher.stop)
+        routers._replica_status.clear()
+        self.addCleanup(routers._replica_status.clear)
+
+    def get_replica_lag(self, alias):
+        if isinstance(self.lags[alias], Exception):
+            raise self.lags[alias]
+        return self.lags[alias]
+
+    def get_block_aliases(self, blocks=20, reads=5):
+        """
+        Return set of aliases used by reads of each replica_reads() block
+        """
+        aliases = []
+        for block in range(blocks):
+            with replica_reads():
+                aliases.append({router.db_for_read(RateLimit) for read in range(reads)})
+        return aliases
+
+    def test_reads_go_to_primary_outside_of_replica_reads(self):
+        self.assertEqual(router.db_for_read(RateLimit), 'default')
+        with replica_reads(False):
+            self.assertEqual(router.db_for_read(RateLimit), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_write(RateLimit), 'default')
+
+    def test_block_reads_from_one_replica(self):
+        aliases = self.get_block_aliases()
+        self.assertTrue(all(len(block_aliases) == 1 for block_aliases in aliases))
+        self.assertEqual(set.union(*aliases), {'replica_0', 'replica_1'})
+
+        with CaptureQueriesContext(connections['replica_0']) as first:
+            with CaptureQueriesContext(connections['replica_1']) as second:
+                with replica_reads():
+                    list(RateLimit.objects.all())
+                    list(UsageCounter.objects.all())
+        self.assertEqual(sorted([len(first), len(second)]), [0, 2])
+
+    def test_lagging_replica_is_taken_out_of_rotation(self):
+        self.lags['replica_0'] = 60
+        self.assertEqual(set.union(*self.get_block_aliases()), {'replica_1'})
+
+        self.lags['replica_1'] = DatabaseError('unreachable')
+        routers._replica_status.clear()
+        self.assertEqual(set.union(*self.get_block_aliases()), {'default'})
+
+    @override_settings(DATABASE_REPLICA_CHECK_INTERVAL=60)
+    def test_replica_status_is_checked_once_per_interval(self):
+        self.get_block_aliases()
+        self.assertEqual(self.get_lag.call_count, 2)
+
+        # Lag is noticed on the next check
+        self.lags['replica_0'] = 60
+        self.get_block_aliases()
+        self.assertEqual(self.get_lag.call_count, 2)
+        routers._replica_status.clear()
+        self.assertEqual(set.union(*self.get_block_aliases()), {'replica_1'})
+
+    @override_settings(DATABASE_PRIMARY_PIN_SECONDS=10)
+    def test_pin_to_primary(self):
+        response = pin_to_primary(HttpResponse())
+        cookie = response.cookies[settings.DATABASE_PRIMARY_PIN_COOKIE]
+        self.assertEqual((cookie.value, cookie['max-age']), ('1', 10))
+
+
+class CachedResponseView(PrecompressedResponseMixin, View):
+    precompress = True
+    content = b'book ' * 400
+    versions = None
+    rendered = None
+
+    def get_cache_version(self):
+        return next(self.versions)
+
+    def get(self, request):
+        self.rendered.append(request.get_full_path())
+        return HttpResponse(self.content, content_type='text/plain')
+
+
+@override_settings(RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=True, MIN_SIZE=1024, ENCODINGS=['gzip']))
+class PrecompressedResponseTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.versions = [1]
+        self.rendered = []
+        self.factory = RequestFactory()
+
+    def get(self, path='/books', content=CachedResponseView.content, **headers):
+        view = CachedResponseView.as_view(
+            content=content, versions=iter(self.versions), rendered=self.rendered,
+        )
+        return view(self.factory.get(path, **headers))
+
+    def assert_served(self, response, encoding, content=CachedResponseView.content):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get('Content-Encoding'), encoding)
+        self.assertEqual(gzip.decompress(response.content) if encoding else response.content, content)
+
+    def test_accept_encoding_is_negotiated(self):
+        for accept_encoding, encoding in [
+            ('gzip', 'gzip'),
+            ('br, GZIP;q=0.5', 'gzip'),
+            ('*', 'gzip'),
+            ('identity, *;q=0.1', 'gzip'),
+            ('gzip;q=0', None),
+            ('*;q=0', None),
+            ('gzip;q=0, *', None),
+            ('identity', None),
+            ('', None),
+        ]:
+            with self.subTest(accept_encoding=accept_encoding):
+                self.assert_served(self.get(HTTP_ACCEPT_ENCODING=accept_encoding), encoding)
+        # Compressed and identity bodies are cached once
+        self.assertEqual(self.rendered, ['/books'])
+
+    def test_vary_on_accept_encoding(self):
+        for headers in [{'HTTP_ACCEPT_ENCODING': 'gzip'}, {}]:
+            response = self.get(**headers)
+            self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_small_response_is_not_compressed(self):
+        content = b'book'
+        self.assert_served(self.get(content=content, HTTP_ACCEPT_ENCODING='gzip'), None, content)
+        self.assertIn('Accept-Encoding', self.get(content=content)['Vary'])
+
+    def test_pinned_client_bypasses_cache(self):
+        for i in range(2):
+            response = self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_X_PIN_PRIMARY='1')
+            self.assert_served(response, None)
+        self.assertEqual(self.rendered, ['/books', '/books'])
+
+    def test_version_change_invalidates_cached_responses(self):
+        self.get(HTTP_ACCEPT_ENCODING='gzip')
+        self.get('/books?year=2005', HTTP_ACCEPT_ENCODING='gzip')
+        self.assert_served(self.get(HTTP_ACCEPT_ENCODING='gzip'), 'gzip')
+        self.assertEqual(self.rendered, ['/books', '/books?year=2005'])
+
+        self.versions[0] = 2
+        content = b'new book ' * 400
+        self.assert_served(self.get(content=content, HTTP_ACCEPT_ENCODING='gzip'), 'gzip', content)
+        self.assert_served(self.get(content=content), None, content)
+        self.assertEqual(self.rendered, ['/books', '/books?year=2005', '/books'])
+
+    def test_version_is_read_once_per_request(self):
+        # Bump between the identity and compressed body must not pair them across versions
+        self.versions = [1, 2]
+        self.assert_served(self.get(HTTP_ACCEPT_ENCODING='gzip'), 'gzip')
+        self.assertEqual(gzip.decompress(cache.get('response:1:gzip:/books')), CachedResponseView.content)
+        self.assertIsNone(cache.get('response:2:gzip:/books'))
@@ -1,2 +1,4 @@
 from .bulkcreate import *
 from .response import *
+from .scheduler import *
+from .singleflight import *
@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def measure(func, requests, concurrency=1):
+    """
+    Call func() `requests` times from `concurrency` threads.
+    Return list of latencies in seconds and total elapsed time.
+    """
+    def timed_call(_):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed_call, range(requests)))
+    return latencies, time.perf_counter() - start
+
+
+def percentile(values, percent):
+    """
+    Return percentile of values (nearest-rank method)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, int(round(percent / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    """
+    Return throughput and latency percentiles (in milliseconds) of measured calls
+    """
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def format_summary(name, summary):
+    """
+    Return one-line report of summarize() result
+    """
+    values = ' '.join(f'{key}={value}' for key, value in summary.items())
+    return f'{name}: {values}'
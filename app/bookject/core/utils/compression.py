@@ -0,0 +1,99 @@
+import gzip
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def compress_gzip(content, level):
+    return gzip.compress(content, compresslevel=level)
+
+
+def compress_brotli(content, level):
+    return brotli.compress(content, quality=level)
+
+
+def compress_zstd(content, level):
+    return zstandard.ZstdCompressor(level=level).compress(content)
+
+
+# Available encodings in order of preference, with their compressors and default levels
+COMPRESSORS = {}
+if brotli is not None:
+    COMPRESSORS['br'] = (compress_brotli, 5)
+if zstandard is not None:
+    COMPRESSORS['zstd'] = (compress_zstd, 10)
+COMPRESSORS['gzip'] = (compress_gzip, 6)
+
+# Compression counters of the process by encoding
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _get_stats(encoding):
+    return _stats.setdefault(encoding, {'compressed': 0, 'cpu_time': 0.0, 'served': 0, 'bytes_saved': 0})
+
+
+def get_accepted_encoding(accept_encoding, encodings=None):
+    """
+    Return the most preferred of available encodings accepted by client per Accept-Encoding header,
+    or None if client accepts none of them
+    """
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    for encoding in encodings or COMPRESSORS:
+        if encoding in COMPRESSORS and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(content, encoding, level=None):
+    """
+    Return content compressed with encoding, CPU time of compression is counted in compression stats
+    """
+    compressor, default_level = COMPRESSORS[encoding]
+    start = time.thread_time()
+    compressed = compressor(content, default_level if level is None else level)
+    cpu_time = time.thread_time() - start
+    with _stats_lock:
+        stats = _get_stats(encoding)
+        stats['compressed'] += 1
+        stats['cpu_time'] += cpu_time
+    return compressed
+
+
+def count_served(encoding, size, compressed_size):
+    """
+    Count response served with precompressed content
+    """
+    with _stats_lock:
+        stats = _get_stats(encoding)
+        stats['served'] += 1
+        stats['bytes_saved'] += size - compressed_size
+
+
+def get_compression_stats():
+    """
+    Return compression counters of the process by encoding: number of compressions and their CPU time in seconds,
+    number of served responses and bytes saved on them
+    """
+    with _stats_lock:
+        return {encoding: dict(stats) for encoding, stats in _stats.items()}
@@ -1,27 +1,30 @@
 import requests
 import logging
 
-from ..exceptions import GetResponseError, ResponseDeserializationError
+from ..exceptions import GetResponseError, ResponseDeserializationError, UpstreamQuotaExceeded
+from .scheduler import get_scheduler, INTERACTIVE
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
 
-def get_response(url):
-    response = None
+def get_response(url, priority=INTERACTIVE):
+    """
+    Return successful response fetched through the shared FetchScheduler or raise GetResponseError.
+    Raise UpstreamQuotaExceeded when daily upstream quota has been used up.
+    """
     try:
-
-        response = requests.get(url)
+        response = get_scheduler().fetch(url, priority=priority)
         # Raise Exception if response is not successful
         response.raise_for_status()
         return response
+    except UpstreamQuotaExceeded:
+        raise
     except requests.HTTPError as http_err:
         logger.error(f"HTTP error occurred: {http_err}")
     except Exception as err:
         logger.error(f"Unknown exception: {err}")
-    finally:
-        if not response:
-            raise GetResponseError
+    raise GetResponseError
 
 
 def deserialize_response(response):
@@ -0,0 +1,262 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from ..exceptions import UpstreamQuotaExceeded
+from ..models import RateLimit, UsageCounter
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lower goes first
+INTERACTIVE = 0
+BULK = 1
+
+# Upstream responses which mean "slow down"
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+class TokenBucket(object):
+    """
+    Allow `rate` requests per second on average, with bursts up to `capacity` requests, within one process.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, sleeping until it is available
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class SharedTokenBucket(object):
+    """
+    Token bucket kept in the database, so the rate limit holds for all processes together.
+    Interactive callers take tokens ahead of time when the bucket is empty and wait for their turn,
+    bulk callers only take tokens above `reserve`, so they yield to interactive callers of any process.
+    Upstream throttling multiplicatively decreases the rate for all processes, successes increase it back.
+    """
+
+    def __init__(self, rate, capacity=None, reserve=None, name='upstream', decrease=0.5, increase=0.05,
+                 minimum_factor=0.05):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.reserve = self.capacity / 2 if reserve is None else reserve
+        self.name = name
+        self.decrease = decrease
+        self.increase = increase
+        self.minimum_factor = minimum_factor
+
+    def acquire(self, priority=INTERACTIVE):
+        """
+        Take one token, sleeping until it is available
+        """
+        # Bucket never holds more than capacity, bulk callers of a small bucket wait until it is full
+        minimum = None if priority == INTERACTIVE else min(1 + self.reserve, self.capacity)
+        while True:
+            tokens, factor, taken = RateLimit.take(self.name, self.rate, self.capacity, minimum)
+            rate = self.rate * factor
+            if taken:
+                if tokens < 0:
+                    # Token borrowed from the future, wait until it would have been refilled
+                    time.sleep(-tokens / rate)
+                return
+            time.sleep((minimum - tokens) / rate)
+
+    def throttled(self):
+        RateLimit.decrease_rate(self.name, self.decrease, self.minimum_factor)
+
+    def succeeded(self):
+        RateLimit.increase_rate(self.name, self.increase)
+
+
+class DailyQuota(object):
+    """
+    Count upstream requests per day in the database, shared by all processes.
+    """
+
+    def __init__(self, limit, key_prefix='fetch-quota'):
+        self.limit = limit
+        self.key_prefix = key_prefix
+
+    def get_key(self):
+        return f'{self.key_prefix}:{date.today().isoformat()}'
+
+    def consume(self):
+        """
+        Count one request. Raise UpstreamQuotaExceeded if the daily limit has been used up.
+        """
+        if not self.limit:
+            return
+        used = UsageCounter.increment(self.get_key(), 1, timezone.now() + timedelta(days=2))
+        if used > self.limit:
+            logger.error(f"Daily upstream quota of {self.limit} requests exceeded")
+            raise UpstreamQuotaExceeded
+
+    def get_remaining(self):
+        if not self.limit:
+            return None
+        return max(0, self.limit - UsageCounter.get_count(self.get_key()))
+
+
+class AIMDLimiter(object):
+    """
+    Concurrency limit of the process with additive increase on success and multiplicative decrease on throttling.
+    Free slots are given to waiting callers by priority, then by order of arrival.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, increase=1.0, decrease=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+
+    def acquire(self, priority=INTERACTIVE):
+        with self._condition:
+            entry = (priority, next(self._counter))
+            heapq.heappush(self._waiters, entry)
+            while self._waiters[0] != entry or self.in_flight >= int(self.limit):
+                self._condition.wait()
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            # Next caller in line may fit in the limit as well
+            self._condition.notify_all()
+
+    def release(self, throttled=False):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                logger.warning(f"Upstream throttling, concurrency limit decreased to {int(self.limit)}")
+            else:
+                # Grows by about `increase` per `limit` successful requests
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            self._condition.notify_all()
+
+
+class FetchScheduler(object):
+    """
+    Send GET requests to the upstream within a rate limit and daily quota shared by all processes,
+    and an adaptive concurrency limit of the process.
+    Throttled (429/5xx) and failed connections are retried with capped, jittered exponential backoff.
+    """
+
+    def __init__(self, rate=5, burst=None, daily_quota=None, concurrency=4, max_concurrency=16,
+                 retries=3, backoff_base=0.5, backoff_cap=30, timeout=10, session=None, bulk_reserve=None):
+        self.bucket = SharedTokenBucket(rate, burst, bulk_reserve)
+        self.quota = DailyQuota(daily_quota)
+        self.limiter = AIMDLimiter(initial=concurrency, maximum=max_concurrency)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def fetch(self, url, priority=INTERACTIVE):
+        """
+        Return response of the last attempt.
+        Raise requests.RequestException if the last attempt failed to connect.
+        """
+        attempt = 0
+        while True:
+            self.quota.consume()
+            self.limiter.acquire(priority)
+            response, throttled = None, True
+            try:
+                self.bucket.acquire(priority)
+                response = self.session.get(url, timeout=self.timeout)
+                throttled = response.status_code in RETRY_STATUS_CODES
+                if throttled:
+                    self.bucket.throttled()
+                else:
+                    self.bucket.succeeded()
+            except (requests.ConnectionError, requests.Timeout) as err:
+                if attempt >= self.retries:
+                    raise
+                logger.warning(f"Upstream request failed - {err}")
+            finally:
+                self.limiter.release(throttled)
+
+            if not throttled or attempt >= self.retries:
+                return response
+
+            delay = self.get_backoff(attempt, response)
+            logger.warning(f"Retrying {url} in {delay:.2f}s (attempt {attempt + 1} of {self.retries})")
+            time.sleep(delay)
+            attempt += 1
+
+    def get_backoff(self, attempt, response=None):
+        """
+        Return delay before next attempt - full jitter, at least Retry-After, never more than backoff_cap
+        """
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get('Retry-After', 0)))
+            except ValueError:
+                # Retry-After given as HTTP date
+                pass
+        return min(delay, self.backoff_cap)
+
+
+def get_scheduler():
+    """
+    Return scheduler shared by all threads of the process, configured with FETCH_SCHEDULER setting
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            options = getattr(settings, 'FETCH_SCHEDULER', {})
+            _scheduler = FetchScheduler(
+                rate=options.get('RATE', 5),
+                burst=options.get('BURST'),
+                daily_quota=options.get('DAILY_QUOTA'),
+                concurrency=options.get('CONCURRENCY', 4),
+                max_concurrency=options.get('MAX_CONCURRENCY', 16),
+                retries=options.get('RETRIES', 3),
+                backoff_base=options.get('BACKOFF_BASE', 0.5),
+                backoff_cap=options.get('BACKOFF_CAP', 30),
+                timeout=options.get('TIMEOUT', 10),
+                bulk_reserve=options.get('BULK_RESERVE'),
+            )
+        return _scheduler
+
+
+def set_scheduler(scheduler):
+    """
+    Replace shared scheduler, eg. with one sending requests to a fake upstream
+    """
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
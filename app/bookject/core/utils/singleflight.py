@@ -0,0 +1,89 @@
+import hashlib
+import threading
+from concurrent.futures import Future
+from datetime import date, timedelta
+
+from django.db import connections
+from django.utils import timezone
+
+from ..models import UsageCounter
+
+
+class SingleFlight(object):
+    """
+    Coalesce concurrent calls with the same key.
+    The first caller runs the function, callers arriving while it runs wait and share its result or exception.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class SharedSingleFlight(object):
+    """
+    Coalesce concurrent calls with the same key in all processes, with PostgreSQL advisory locks.
+    The first caller runs the function holding the lock of the key, callers arriving meanwhile wait for the lock.
+    If the leader succeeded they return None without running the function, else they run it one at a time.
+    Only success is shared, not the result - meant for functions which write their result to the database.
+    """
+
+    def __init__(self, name, using='default'):
+        self.name = name
+        self.using = using
+        self.coalesced = 0
+
+    def get_keys(self, key):
+        """
+        Return advisory lock id and key of counter of successful calls
+        """
+        digest = hashlib.sha1(f'{self.name}:{key}'.encode()).digest()
+        lock_id = int.from_bytes(digest[:8], 'big', signed=True)
+        return lock_id, f'{self.name}:{date.today().isoformat()}:{digest.hex()}'
+
+    def do(self, key, func, *args, **kwargs):
+        lock_id, counter_key = self.get_keys(key)
+        connection = connections[self.using]
+        # Call which succeeds while this one waits increments the counter
+        completed = UsageCounter.get_count(counter_key)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [lock_id])
+            if not cursor.fetchone()[0]:
+                self.coalesced += 1
+                cursor.execute('SELECT pg_advisory_lock(%s)', [lock_id])
+        try:
+            if UsageCounter.get_count(counter_key) != completed:
+                return None
+            result = func(*args, **kwargs)
+            UsageCounter.increment(counter_key, 1, timezone.now() + timedelta(days=2))
+            return result
+        finally:
+            # Session lock would outlive the request on pooled connection
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [lock_id])
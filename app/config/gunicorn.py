@@ -0,0 +1,31 @@
+"""
+Gunicorn config for bookject.
+
+The app is loaded once in the master process and workers are forked after Django setup,
+so a new worker does not import settings, apps and URLconf again.
+"""
+import multiprocessing
+import os
+
+bind = '0.0.0.0:8000'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+preload_app = True
+
+
+def when_ready(server):
+    """
+    Import URLconf in the master, so workers inherit it instead of loading it on the first request
+    """
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+
+def pre_fork(server, worker):
+    """
+    Connections opened in the master must not be shared with workers - they are given back
+    to the master's pools and closed there, workers inherit no open connection
+    """
+    from django.db import connections
+    from bookject.core.db.pool import close_all_pools
+    connections.close_all()
+    close_all_pools()
@@ -7,13 +7,17 @@ PROJECT_NAME = 'bookject'
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 ROOT_DIR = BASE_DIR / PROJECT_NAME
 MEDIA_ROOT = ROOT_DIR / 'media'
+MEDIA_URL = '/media/'
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
-STATIC_URL = 'static/'
+STATIC_URL = '/static/'
+# Collected at image build time, see Dockerfile.prod
+STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_FINDERS = (
     'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
 )
 
 
@@ -78,6 +82,64 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 
+# Database
+# https://docs.djangoproject.com/en/3.1/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        # PostgreSQL backend with per-process connection pool, see bookject.core.db.pool
+        'ENGINE': 'bookject.core.db.backends.postgresql_pool',
+        'NAME': get_env_variable('SQL_DATABASE'),
+        'USER': get_env_variable('SQL_USER'),
+        'PASSWORD': get_env_variable('SQL_PASSWORD'),
+        'HOST': get_env_variable('SQL_HOST'),
+        'PORT': get_env_variable('SQL_PORT'),
+        # Connection is given back to the pool at the end of each request, pool keeps it open
+        'CONN_MAX_AGE': int(get_env_variable('SQL_CONN_MAX_AGE') or 0),
+        'POOL': {
+            'MAX_SIZE': int(get_env_variable('SQL_POOL_MAX_SIZE') or 10),
+            'IDLE_TIMEOUT': int(get_env_variable('SQL_POOL_IDLE_TIMEOUT') or 300),
+            'TIMEOUT': int(get_env_variable('SQL_POOL_TIMEOUT') or 30),
+            'HEALTH_CHECKS': True,
+        },
+    }
+}
+
+# Read replicas of default database, eg. SQL_REPLICA_HOSTS=replica1,replica2:5433/bookject
+for index, replica in enumerate(filter(None, (get_env_variable('SQL_REPLICA_HOSTS') or '').split(','))):
+    address, _, name = replica.partition('/')
+    host, _, port = address.partition(':')
+    DATABASES[f'replica_{index}'] = dict(
+        DATABASES['default'],
+        HOST=host,
+        PORT=port or DATABASES['default']['PORT'],
+        NAME=name or DATABASES['default']['NAME'],
+        TEST={'MIRROR': 'default'},
+    )
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['bookject.core.db.routers.ReplicaRouter']
+
+# Replica which falls behind more than DATABASE_REPLICA_MAX_LAG seconds is taken out of rotation
+DATABASE_REPLICA_MAX_LAG = int(get_env_variable('SQL_REPLICA_MAX_LAG') or 10)
+DATABASE_REPLICA_CHECK_INTERVAL = 5  # seconds
+
+# Reads of client which has just ingested books go to primary
+DATABASE_PRIMARY_PIN_SECONDS = 10
+DATABASE_PRIMARY_PIN_COOKIE = 'bookject_pin_primary'
+DATABASE_PRIMARY_PIN_HEADER = 'HTTP_X_PIN_PRIMARY'  # X-Pin-Primary request header
+
+
+# Cache of each process, eg. for rendered responses. State shared by processes (upstream rate limit and quotas)
+# is kept in the database, see bookject.core.models
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -115,4 +177,82 @@ USE_TZ = True
 
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend']
-}
\ No newline at end of file
+}
+
+
+# Google Books fetch scheduler, see bookject.core.utils.scheduler
+
+FETCH_SCHEDULER = {
+    'RATE': float(get_env_variable('FETCH_RATE') or 5),  # requests per second of all processes together
+    'BURST': None,  # defaults to RATE
+    'BULK_RESERVE': None,  # tokens bulk requests leave to interactive ones, defaults to half of BURST
+    'DAILY_QUOTA': int(get_env_variable('FETCH_DAILY_QUOTA') or 1000),  # 0 disables the quota
+    'CONCURRENCY': 4,
+    'MAX_CONCURRENCY': 16,
+    'RETRIES': 3,
+    'BACKOFF_BASE': 0.5,  # seconds
+    'BACKOFF_CAP': 30,  # seconds
+    'TIMEOUT': 10,  # seconds
+}
+
+
+# Background refresh of stale books, see bookject.books.refresh
+
+BOOKS_REFRESH = {
+    'BATCH_SIZE': 40,
+    'HOURLY_BUDGET': int(get_env_variable('BOOKS_REFRESH_HOURLY_BUDGET') or 200),  # upstream requests, 0 for no limit
+    'STALE_AFTER': 24 * 60 * 60,  # seconds
+    'RETRY_AFTER': 60 * 60,  # seconds before book which failed to refresh is retried, doubled with each failure
+    'INTERVAL': 60,  # seconds between batches of refresh_books --loop
+    'CONCURRENCY': 4,
+}
+
+
+# Serve /books and /books/:pk from denormalized read model columns of Book, see rebuild_read_model command
+
+BOOKS_SERVE_READ_MODEL = True
+
+
+# Thumbnails cached under MEDIA_ROOT and served by nginx, see bookject.books.thumbnails
+
+BOOKS_THUMBNAILS = {
+    'ENABLED': True,  # download thumbnails in the background after ingestion
+    'CONCURRENCY': 4,  # concurrent downloads per process
+    'RATE': 10,  # downloads per second per process, images are not fetched through FETCH_SCHEDULER
+    'TIMEOUT': 10,  # seconds
+    'MAX_SIZE': (128, 192),  # resize and re-encode as JPEG if Pillow is installed, None keeps originals
+    'QUALITY': 85,
+}
+
+
+# Ranking score of /books/top - average rating weighted as if every book had
+# BOOKS_SCORE_PRIOR_COUNT additional ratings of BOOKS_SCORE_PRIOR_MEAN
+
+BOOKS_SCORE_PRIOR_MEAN = 3.0
+BOOKS_SCORE_PRIOR_COUNT = 10
+
+
+# Number of books written by BookDownloader in one transaction
+
+BOOKS_INGEST_CHUNK_SIZE = 100
+
+
+# In-process index answering /books filters and ordering without the database, see bookject.books.catalog
+
+BOOKS_CATALOG_INDEX = {
+    'ENABLED': bool(int(get_env_variable('BOOKS_CATALOG_INDEX') or 0)),
+    'CHECK_INTERVAL': 1,  # seconds between checks of catalog version
+    'REBUILD_INTERVAL': 60 * 60,  # seconds, picks up changes which do not bump catalog version
+    'PATCH_OVERLAP': 60,  # seconds, books committed this late after their modified_date are still patched in
+}
+
+
+# Rendered /books and /books/top responses cached per catalog version together with their compressed bodies,
+# see bookject.core.mixins.PrecompressedResponseMixin. Brotli and zstd are used if installed.
+
+RESPONSE_CACHE = {
+    'ENABLED': True,
+    'TIMEOUT': 10 * 60,  # seconds
+    'MIN_SIZE': 1024,  # bytes, smaller responses are not compressed
+    'ENCODINGS': ['br', 'zstd', 'gzip'],  # in order of preference
+}
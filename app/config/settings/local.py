@@ -2,22 +2,9 @@ from .base import *
 
 DEBUG = True
 
-# Database
-# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': get_env_variable('SQL_DATABASE'),
-        'USER': get_env_variable('SQL_USER'),
-        'PASSWORD': get_env_variable('SQL_PASSWORD'),
-        'HOST': get_env_variable('SQL_HOST'),
-        'PORT': get_env_variable('SQL_PORT'),
-    }
-}
-
-INSTALLED_APPS += [
+# New lists, so debug toolbar is not added to lists of base settings imported by other settings modules
+INSTALLED_APPS = INSTALLED_APPS + [
     'debug_toolbar',
 ]
 
-MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware', ]
+MIDDLEWARE = MIDDLEWARE + ['debug_toolbar.middleware.DebugToolbarMiddleware', ]
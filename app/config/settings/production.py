@@ -1,3 +1,6 @@
 from .base import *
 
 DEBUG = False
+
+# Hashed names and manifest are generated by collectstatic at image build time
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
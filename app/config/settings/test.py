@@ -1,3 +1,9 @@
 from .base import *
 
 DEBUG = False
+
+# Without configured replicas, tests of replica routing use two connections mirroring the test database
+if not DATABASE_REPLICAS:
+    for alias in ['replica_0', 'replica_1']:
+        DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS = ['replica_0', 'replica_1']
@@ -11,4 +11,7 @@ then
     echo "PostgreSQL started"
 fi
 
+# Static files are collected at build time, only copy them to the volume shared with nginx
+cp -R $APP_HOME/staticfiles/. $APP_HOME/bookject/static/
+
 exec "$@"
\ No newline at end of file
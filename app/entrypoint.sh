@@ -13,6 +13,6 @@ fi
 
 # python manage.py flush --no-input
 # python manage.py migrate
-python manage.py collectstatic --no-input
+# Static files are served by runserver in development, collectstatic runs at build time of production image
 
 exec "$@"